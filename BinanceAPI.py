@@ -22,9 +22,10 @@
 import time
 import hmac
 import hashlib
-import requests
 import pandas as pd
 
+import RequestScheduler
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -94,8 +95,8 @@ class BinanceAPI:
                     self.recv_window) + "&timestamp=" + str(timestamp)
 
         hmac_base_request = hmac.new(bytes(self.private_key, 'utf-8'), query_string.encode('utf-8'), hashlib.sha256)
-        r = requests.post(url=base_request + "?" + query_string + "&signature=" + hmac_base_request.hexdigest(),
-                          headers={'X-MBX-APIKEY': self.public_key, })
+        r = RequestScheduler.RequestScheduler.get_scheduler().post(base_request + "?" + query_string + "&signature=" + hmac_base_request.hexdigest(),
+                                                                   headers={'X-MBX-APIKEY': self.public_key, })
         r_json = r.json()
         if not self.error_handler(r):
             return pd.json_normalize(r_json)
@@ -123,8 +124,8 @@ class BinanceAPI:
                 query_string = ""
 
         hmac_base_request = hmac.new(bytes(self.private_key, 'utf-8'), query_string.encode('utf-8'), hashlib.sha256)
-        r = requests.post(url=base_request + "?" + query_string + "&signature=" + hmac_base_request.hexdigest(),
-                          headers={'X-MBX-APIKEY': self.public_key, })
+        r = RequestScheduler.RequestScheduler.get_scheduler().post(base_request + "?" + query_string + "&signature=" + hmac_base_request.hexdigest(),
+                                                                   headers={'X-MBX-APIKEY': self.public_key, })
         r_json = r.json()
 
         if not self.error_handler(r):
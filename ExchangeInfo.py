@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import os
+import json
+import time
+import threading
+
+import PriceService
+import RequestScheduler
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ExchangeInfo:
+    exchange_info_url = "https://api.binance.com/api/v3/exchangeInfo"
+    path = "./data/exchange_info.json"
+    # Seconds after which symbols are downloaded again
+    refresh_interval = 86400
+    # Fields of exchangeInfo kept for each symbol
+    symbol_fields = ["baseAsset", "quoteAsset", "status"]
+
+    exchange_info = None
+    exchange_info_lock = threading.Lock()
+
+    def __init__(self, path=None, refresh_interval=None):
+        self.path = path if path else ExchangeInfo.path
+        self.refresh_interval = refresh_interval if refresh_interval else ExchangeInfo.refresh_interval
+        self.lock = threading.Lock()
+        self.symbols = {}
+        self.update_time = 0.0
+
+        # Quote asset -> USDT ratio, valid as long as the spot price snapshot they were read from
+        self.usdt_ratios = {}
+        self.ratio_snapshot = None
+
+        self.load()
+
+    @staticmethod
+    def get_exchange_info():
+        with ExchangeInfo.exchange_info_lock:
+            if ExchangeInfo.exchange_info is None:
+                ExchangeInfo.exchange_info = ExchangeInfo()
+            return ExchangeInfo.exchange_info
+
+    def load(self):
+        # Symbols saved by a previous run are used until they are refresh_interval old
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as info_file:
+                    saved_info = json.load(info_file)
+                self.symbols = saved_info["symbols"]
+                self.update_time = saved_info["update_time"]
+            except (ValueError, KeyError):
+                logger.warning("Could not read " + self.path + ", downloading exchangeInfo again")
+        if time.time() - self.update_time >= self.refresh_interval:
+            self.refresh()
+
+    def refresh(self):
+        r_json = RequestScheduler.RequestScheduler.get_scheduler().get(ExchangeInfo.exchange_info_url, weight=10,
+                                                                       priority=RequestScheduler.RequestScheduler.PRICE)
+        self.symbols = {row["symbol"]: {field: row.get(field) for field in ExchangeInfo.symbol_fields} for row in r_json.json()["symbols"]}
+        self.update_time = time.time()
+        logger.debug("exchangeInfo downloaded for " + str(len(self.symbols)) + " symbols")
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as info_file:
+            json.dump({"update_time": self.update_time, "symbols": self.symbols}, info_file)
+        os.replace(self.path + ".tmp", self.path)
+
+    def get_symbol_info(self, symbol):
+        # None for symbols unknown to Binance
+        with self.lock:
+            if time.time() - self.update_time >= self.refresh_interval:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error("exchangeInfo could not be refreshed, keeping the previous one : " + str(e))
+            return self.symbols.get(symbol)
+
+    def get_usdt_ratio(self, symbol):
+        # Orders are based on quote_asset for buying / selling
+        # If it is different from USDT, using QUOTE/USDT pair is necessary to keep track of USD content in the wallet
+        # None is returned for symbols unknown to Binance
+        if symbol[-4:] == "USDT":
+            return 1
+        symbol_info = self.get_symbol_info(symbol)
+        if not symbol_info:
+            return None
+
+        price_service = PriceService.PriceService.get_service(futures=False)
+        snapshot = price_service.get_snapshot()
+        with self.lock:
+            if snapshot is not self.ratio_snapshot:
+                self.usdt_ratios = {}
+                self.ratio_snapshot = snapshot
+            quote_asset = symbol_info["quoteAsset"]
+            if quote_asset not in self.usdt_ratios:
+                quote_usdt = quote_asset + "USDT"
+                self.usdt_ratios[quote_asset] = snapshot[quote_usdt] if quote_usdt in snapshot else price_service.request_price(quote_usdt)
+            return self.usdt_ratios[quote_asset]
+
+    def to_str(self):
+        return "Exchange info : " + str(len(self.symbols)) + " symbols, updated at " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.update_time))
+
+
+def main():
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    exchange_info = ExchangeInfo.get_exchange_info()
+    logger.debug(exchange_info.to_str())
+    for symbol in ["BNBBTC", "LINKETH", "BTCUSDT", "UNKNOWN"]:
+        logger.debug(symbol + " : " + str(exchange_info.get_symbol_info(symbol)) + ", USDT ratio " + str(exchange_info.get_usdt_ratio(symbol)))
+
+    print("End of the <<ExchangeInfo>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import threading
+import collections
+import numpy as np
+import pandas as pd
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class IndicatorCache:
+    max_size = 256
+
+    cache = None
+    cache_lock = threading.Lock()
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size if max_size else IndicatorCache.max_size
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_cache():
+        with IndicatorCache.cache_lock:
+            if IndicatorCache.cache is None:
+                IndicatorCache.cache = IndicatorCache()
+            return IndicatorCache.cache
+
+    @staticmethod
+    def get_column_id(column):
+        # Buffer, strides and length of the values of a column, None for values that are not a numpy array
+        values = column.values
+        if not isinstance(values, np.ndarray):
+            return None
+        return values.__array_interface__["data"][0], values.strides, len(values)
+
+    @staticmethod
+    def make_key(name, inputs, params):
+        # Inputs are identified by the symbol, interval and version set in their attrs by Klines.get_kline_frame(), the
+        # version changing whenever a kline changes. Only the columns of that frame are identified, by the ids kept in
+        # its attrs : derived series keep the attrs but not the values. None is returned for any other input.
+        key = [name, tuple(sorted(params.items()))]
+        for data in inputs:
+            if not isinstance(data, (pd.Series, pd.DataFrame)) or "version" not in data.attrs or data.empty:
+                return None
+            columns = {data.name: data} if isinstance(data, pd.Series) else {column: data[column] for column in data.columns}
+            column_ids = data.attrs["column_ids"]
+            for column_name, column in columns.items():
+                if column_name not in column_ids or IndicatorCache.get_column_id(column) != column_ids[column_name]:
+                    return None
+            key.append((data.attrs["symbol"], data.attrs["interval"], data.attrs["version"], tuple(columns)))
+        return tuple(key)
+
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            # Least recently used indicators are dropped first
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def to_str(self):
+        stats = self.get_stats()
+        return "Indicator cache : " + str(stats["hits"]) + " hits, " + str(stats["misses"]) + " misses, " + str(stats["size"]) + " entries"
+
+
+def main():
+    import Klines
+    import indicators
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    kline_frame = Klines.Klines("BTCUSDT", "1h", futures=True, keep_last=True).get_kline_frame()
+    for i in range(3):
+        indicators.get_sma(kline_frame.close, timeperiod=30)
+    logger.debug(IndicatorCache.get_cache().to_str())
+
+    print("End of the <<IndicatorCache>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
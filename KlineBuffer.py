@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import numpy as np
+import pandas as pd
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class KlineBuffer:
+    # Every row is written twice, at slot and slot + capacity, so that the last rows are always contiguous in memory
+    # and can be exposed as a view without copying them
+
+    def __init__(self, capacity, column_dtypes, index_name="open_time"):
+        self.capacity = capacity
+        self.index_name = index_name
+        self.index = np.zeros(2 * capacity, dtype=np.int64)
+        self.columns = {name: np.zeros(2 * capacity, dtype=dtype) for name, dtype in column_dtypes.items()}
+        self.size = 0
+        self.last_slot = capacity - 1
+
+    @staticmethod
+    def from_frame(kline_frame, capacity):
+        column_dtypes = {name: (dtype if dtype != object else np.float64) for name, dtype in kline_frame.dtypes.items()}
+        kline_buffer = KlineBuffer(capacity, column_dtypes, index_name=kline_frame.index.name)
+        kline_buffer.append_frame(kline_frame)
+        return kline_buffer
+
+    def __len__(self):
+        return self.size
+
+    def append_frame(self, kline_frame):
+        # Older rows than the capacity would be overwritten right away, they are not written at all
+        kline_frame = kline_frame.iloc[-self.capacity:]
+        rows = len(kline_frame)
+        if rows == 0:
+            return
+
+        slots = (self.last_slot + 1 + np.arange(rows)) % self.capacity
+        self.index[slots] = kline_frame.index.values
+        self.index[slots + self.capacity] = kline_frame.index.values
+        for name, column in self.columns.items():
+            values = kline_frame[name].values
+            column[slots] = values
+            column[slots + self.capacity] = values
+
+        self.last_slot = slots[-1]
+        self.size = min(self.size + rows, self.capacity)
+
+    def drop_last(self):
+        if self.size:
+            self.last_slot = (self.last_slot - 1) % self.capacity
+            self.size -= 1
+
+    def get_frame(self):
+        # The frame shares memory with the buffer, it only stays valid until the next append
+        end = self.last_slot + self.capacity + 1
+        start = end - self.size
+        columns = {name: column[start:end] for name, column in self.columns.items()}
+        index = pd.Index(self.index[start:end], name=self.index_name, copy=False)
+        return pd.DataFrame(columns, index=index, copy=False)
+
+
+def main():
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    kline_frame = pd.DataFrame({"close": np.arange(8, dtype=np.float64)}, index=pd.Index(np.arange(8) * 60000, name="open_time"))
+    kline_buffer = KlineBuffer.from_frame(kline_frame.iloc[:3], capacity=5)
+    for i in range(3, 8):
+        kline_buffer.append_frame(kline_frame.iloc[i:i + 1])
+        logger.debug(kline_buffer.get_frame().close.tolist())
+
+    print("End of the <<KlineBuffer>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class KlinePanel:
+    # Klines of many symbols as (symbols x time) arrays sharing the same open times, so that indicators and strategies
+    # are computed for every symbol in a single call. Klines missing for a symbol are NaN.
+    column_names = ["open", "high", "low", "close", "volume"]
+
+    def __init__(self, symbols, open_times, columns, interval=None):
+        self.symbols = list(symbols)
+        self.open_times = open_times
+        self.columns = columns
+        self.interval = interval
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @staticmethod
+    def from_frames(kline_frames, length=None, column_names=None, interval=None):
+        # kline_frames is a dict of symbol -> kline frame, only the last length open times are kept
+        column_names = column_names if column_names else KlinePanel.column_names
+        kline_frames = {symbol: frame for symbol, frame in kline_frames.items() if not frame.empty}
+        symbols = list(kline_frames)
+
+        if kline_frames:
+            open_times = np.unique(np.concatenate([frame.index.values for frame in kline_frames.values()]))
+        else:
+            open_times = np.empty(0, dtype=np.int64)
+        if length:
+            open_times = open_times[-length:]
+
+        columns = {name: np.full((len(symbols), len(open_times)), np.nan) for name in column_names}
+        for row, frame in enumerate(kline_frames.values()):
+            kept = frame.index.values >= open_times[0]
+            positions = np.searchsorted(open_times, frame.index.values[kept])
+            for name in column_names:
+                columns[name][row, positions] = frame[name].values[kept]
+
+        return KlinePanel(symbols, open_times, columns, interval=interval)
+
+    @staticmethod
+    def from_tails(kline_frames, length, column_names=None, interval=None):
+        # Last length klines of each symbol, aligned on the last kline of each symbol rather than on open times, so
+        # open_times is then a (symbols x time) array. Symbols having fewer klines are completed with NaN first.
+        column_names = column_names if column_names else KlinePanel.column_names
+        symbols = list(kline_frames)
+        open_times = np.full((len(symbols), length), -1, dtype=np.int64)
+        columns = {name: np.full((len(symbols), length), np.nan) for name in column_names}
+        for row, frame in enumerate(kline_frames.values()):
+            tail = frame.iloc[-length:]
+            open_times[row, length - len(tail):] = tail.index.values
+            for name in column_names:
+                columns[name][row, length - len(tail):] = tail[name].values
+
+        return KlinePanel(symbols, open_times, columns, interval=interval)
+
+    @staticmethod
+    def from_kline_set(kline_set, interval=None, length=None, column_names=None):
+        kline_frames = {symbol: kline_set.get_kline_frame(symbol, interval) for symbol in kline_set.get_symbols()}
+        return KlinePanel.from_frames(kline_frames, length=length, column_names=column_names,
+                                      interval=interval if interval else kline_set.interval)
+
+    def __getattr__(self, name):
+        # Columns are read as attributes, as with kline frames : panel.close
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def get_symbols(self):
+        return self.symbols
+
+    def get_column(self, name):
+        return self.columns[name]
+
+    def get_symbol_row(self, symbol, name):
+        return self.columns[name][self.symbol_index[symbol]]
+
+    def shape(self):
+        return len(self.symbols), self.open_times.shape[-1]
+
+
+def main():
+    import KlineSet
+    import indicators
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    kline_set = KlineSet.KlineSet(["BTCUSDT", "ETHUSDT", "BNBUSDT"], "1h", futures=True, keep_last=True)
+    kline_panel = KlinePanel.from_kline_set(kline_set)
+    logger.debug("Panel of shape " + str(kline_panel.shape()))
+    logger.debug(indicators.get_panel_sma(kline_panel.close, timeperiod=30)[:, -3:])
+
+    kline_set.close()
+    print("End of the <<KlinePanel>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import numpy as np
+import pandas as pd
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class KlineResampler:
+    # How each kline column is aggregated into a higher interval
+    aggregations = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum",
+                    "quote_asset_volume": "sum", "trade_number": "sum", "tb_base_av": "sum", "tb_quote_av": "sum"}
+    # Binance weekly klines open on mondays while the epoch was a thursday
+    week_offset = 4 * 86400000
+
+    def __init__(self, interval, interval_sec, capacity=None):
+        self.interval = interval
+        self.interval_ms = interval_sec * 1000
+        self.capacity = capacity
+        self.kline_frame = None
+        # Closed base klines of the buckets that are not complete yet
+        self.pending = None
+        self.last_open_time = None
+
+    def get_bucket_bounds(self, open_times):
+        if self.interval == "1M":
+            months = pd.to_datetime(open_times, unit="ms").to_period("M")
+            starts = months.start_time.values.astype("datetime64[ms]").astype(np.int64)
+            ends = (months + 1).start_time.values.astype("datetime64[ms]").astype(np.int64)
+            return starts, ends
+
+        offset = KlineResampler.week_offset if self.interval == "1w" else 0
+        starts = open_times - (open_times - offset) % self.interval_ms
+        return starts, starts + self.interval_ms
+
+    def aggregate(self, klines, starts, ends):
+        grouped = klines.groupby(starts, sort=True)
+        columns = {name: grouped[name].agg(how) for name, how in KlineResampler.aggregations.items() if name in klines}
+        frame = pd.DataFrame(columns)
+        frame.index = frame.index.astype(np.int64).rename(klines.index.name)
+        if "close_time" in klines:
+            first_rows = np.unique(starts, return_index=True)[1]
+            frame["close_time"] = ends[first_rows] - 1
+        return frame[[name for name in klines.columns if name in frame]]
+
+    def seed(self, kline_frame, start_time):
+        # Klines of this interval downloaded from Binance before start_time, the open time of the first bucket that is
+        # built from base klines. Base klines opened before start_time are then ignored.
+        self.kline_frame = kline_frame.loc[kline_frame.index < start_time]
+        if self.capacity:
+            self.kline_frame = self.kline_frame.iloc[-self.capacity:]
+        self.last_open_time = start_time - 1
+
+    def add_klines(self, closed_klines):
+        # Base klines must all be closed, the ones already given before are ignored
+        if self.last_open_time is not None:
+            closed_klines = closed_klines.loc[closed_klines.index > self.last_open_time]
+        if closed_klines.empty:
+            return 0
+        self.last_open_time = closed_klines.index[-1]
+
+        if self.pending is None:
+            # The bucket of the first base kline is incomplete unless this kline opens it, it is skipped
+            starts, ends = self.get_bucket_bounds(closed_klines.index.values[:1])
+            if starts[0] != closed_klines.index[0]:
+                closed_klines = closed_klines.loc[closed_klines.index >= ends[0]]
+            self.pending = closed_klines.copy()
+        else:
+            self.pending = pd.concat([self.pending, closed_klines])
+
+        if self.pending.empty:
+            return 0
+
+        starts, ends = self.get_bucket_bounds(self.pending.index.values)
+        last_close_time = self.pending.close_time.values[-1] if "close_time" in self.pending else self.pending.index[-1]
+        complete = ends - 1 <= last_close_time
+        if not complete.any():
+            return 0
+
+        new_klines = self.aggregate(self.pending.loc[complete], starts[complete], ends[complete])
+        self.pending = self.pending.loc[~complete]
+
+        self.kline_frame = new_klines if self.kline_frame is None else pd.concat([self.kline_frame, new_klines])
+        if self.capacity:
+            self.kline_frame = self.kline_frame.iloc[-self.capacity:]
+
+        logger.debug(str(len(new_klines)) + " " + self.interval + " klines built from the base interval")
+        return len(new_klines)
+
+    def get_kline_frame(self, open_klines=None, keep_last=True):
+        # The kline of the incomplete bucket is only built with keep_last, from the pending klines and open_klines, the
+        # base klines not closed yet giving its current values
+        frame = self.kline_frame
+        partial = None
+        if keep_last:
+            partial = self.pending if open_klines is None or open_klines.empty else pd.concat([self.pending, open_klines])
+        if partial is not None and not partial.empty:
+            starts, ends = self.get_bucket_bounds(partial.index.values)
+            partial_frame = self.aggregate(partial, starts, ends)
+            frame = partial_frame if frame is None else pd.concat([frame, partial_frame])
+        return frame if frame is not None else pd.DataFrame()
+
+
+def main():
+    import Klines
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    btc_klines = Klines.Klines("BTCUSDT", "1m", limit=1000, futures=True, keep_last=True)
+    btc_klines.add_interval("15m")
+    btc_klines.add_interval("1h")
+    logger.debug(btc_klines.get_kline_frame("15m").tail())
+    logger.debug(btc_klines.get_kline_frame("1h").tail())
+
+    print("End of the <<KlineResampler>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
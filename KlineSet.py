@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import contextlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+import Klines
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class KlineSet:
+    max_workers = 32
+
+    def __init__(self, symbols, interval, max_workers=None, kline_frames=None, **kline_args):
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.kline_args = kline_args
+        self.executor = ThreadPoolExecutor(max_workers=max_workers if max_workers else KlineSet.max_workers)
+
+        # Klines are downloaded concurrently, each request going through the shared RequestScheduler, unless
+        # kline_frames gives the history of each symbol
+        kline_frames = kline_frames if kline_frames else {}
+        klines = self.map(lambda symbol: Klines.Klines(symbol, self.interval, kline_frame=kline_frames.get(symbol), **self.kline_args),
+                          self.symbols)
+        self.klines = dict(zip(self.symbols, klines))
+
+        logger.debug("KlineSet created for " + str(len(self.symbols)) + " symbols on " + self.interval)
+
+    def map(self, function, items):
+        # Returns once every item has been processed, the first exception raised by a worker is raised again here
+        return list(self.executor.map(function, items))
+
+    def update_all(self):
+        # Returns the symbols for which a new kline has been closed
+        updated = self.map(lambda symbol_klines: symbol_klines.update_klines(), self.klines.values())
+        symbols = [symbol for symbol, new_kline in zip(self.klines, updated) if new_kline]
+        logger.debug("New closed kline for " + str(len(symbols)) + " of " + str(len(self.symbols)) + " symbols")
+        return symbols
+
+    def get_symbols(self):
+        return self.symbols
+
+    def get_klines(self, symbol):
+        return self.klines[symbol]
+
+    @contextlib.contextmanager
+    def hold(self, symbols=None):
+        # Klines of symbols are not changed by other threads, a KlineStream for instance, until the block exits
+        with contextlib.ExitStack() as stack:
+            for symbol in (symbols if symbols is not None else self.symbols):
+                stack.enter_context(self.klines[symbol].lock)
+            yield
+
+    def add_interval(self, interval):
+        # Higher intervals are built locally from the klines of every symbol, no request is sent
+        for symbol_klines in self.klines.values():
+            symbol_klines.add_interval(interval)
+
+    def get_kline_frame(self, symbol, interval=None):
+        return self.klines[symbol].get_kline_frame(interval)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def main():
+    import time
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "MKRUSDT", "ALGOUSDT", "SOLUSDT", "DOGEUSDT", "LINKUSDT"]
+    start = time.time()
+    kline_set = KlineSet(symbols, "1m", futures=True, keep_last=True)
+    logger.debug("Created in " + str(time.time() - start) + "s")
+
+    start = time.time()
+    updated_symbols = kline_set.update_all()
+    logger.debug(str(updated_symbols) + " updated in " + str(time.time() - start) + "s")
+    logger.debug(kline_set.get_kline_frame("BTCUSDT").tail())
+
+    kline_set.close()
+    print("End of the <<KlineSet>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import os
+import numpy as np
+import pandas as pd
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class KlineStore:
+    # Klines are stored as fixed size records appended to one file per (symbol, interval, futures)
+    record_dtype = np.dtype([("open_time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+                             ("volume", "<f8"), ("close_time", "<i8"), ("quote_asset_volume", "<f8"),
+                             ("trade_number", "<i8"), ("tb_base_av", "<f8"), ("tb_quote_av", "<f8")])
+
+    def __init__(self, directory="./data/klines"):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, symbol, interval, futures):
+        market = "futures" if futures else "spot"
+        return os.path.join(self.directory, symbol + "_" + interval + "_" + market + ".bin")
+
+    def get_records(self, symbol, interval, futures):
+        path = self.get_path(symbol, interval, futures)
+        record_count = os.path.getsize(path) // KlineStore.record_dtype.itemsize if os.path.exists(path) else 0
+        if record_count == 0:
+            return None
+        # A partial record left by an interrupted append() is not mapped
+        return np.memmap(path, dtype=KlineStore.record_dtype, mode="r", shape=(record_count,))
+
+    def truncate_partial_record(self, symbol, interval, futures):
+        path = self.get_path(symbol, interval, futures)
+        if not os.path.exists(path):
+            return
+
+        size = os.path.getsize(path)
+        partial_size = size % KlineStore.record_dtype.itemsize
+        if partial_size:
+            logger.warning("Dropping a partial record of " + str(partial_size) + " bytes from " + path)
+            os.truncate(path, size - partial_size)
+
+    def first_open_time(self, symbol, interval, futures):
+        records = self.get_records(symbol, interval, futures)
+        return None if records is None else int(records["open_time"][0])
+
+    def last_open_time(self, symbol, interval, futures):
+        records = self.get_records(symbol, interval, futures)
+        return None if records is None else int(records["open_time"][-1])
+
+    def load(self, symbol, interval, futures, start_time=None, end_time=None, limit=None):
+        records = self.get_records(symbol, interval, futures)
+        if records is None:
+            return KlineStore.records_to_frame(np.empty(0, dtype=KlineStore.record_dtype))
+
+        # Records are sorted by open_time, only the requested slice is read from disk
+        open_times = records["open_time"]
+        first = np.searchsorted(open_times, int(start_time), side="left") if start_time else 0
+        last = np.searchsorted(open_times, int(end_time), side="right") if end_time else len(records)
+        if limit and not start_time:
+            first = max(first, last - limit)
+
+        return KlineStore.records_to_frame(np.array(records[first:last]))
+
+    def append(self, symbol, interval, futures, kline_frame):
+        last_stored = self.last_open_time(symbol, interval, futures)
+        if last_stored is not None:
+            kline_frame = kline_frame.loc[kline_frame.index > last_stored]
+
+        if kline_frame.empty:
+            return 0
+
+        # Records appended after a partial one would all be read shifted
+        self.truncate_partial_record(symbol, interval, futures)
+        with open(self.get_path(symbol, interval, futures), "ab") as store_file:
+            KlineStore.frame_to_records(kline_frame).tofile(store_file)
+
+        logger.debug("Stored " + str(len(kline_frame)) + " klines for " + symbol + " " + interval)
+        return len(kline_frame)
+
+    @staticmethod
+    def frame_to_records(kline_frame):
+        # Every column is stored, klines kept with ohlcv_only can not be stored as their missing values would be
+        # loaded as data
+        missing_names = [name for name in KlineStore.record_dtype.names[1:] if name not in kline_frame]
+        if missing_names:
+            raise ValueError("Klines without " + ", ".join(missing_names) + " can not be stored")
+
+        records = np.empty(len(kline_frame), dtype=KlineStore.record_dtype)
+        records["open_time"] = kline_frame.index.values
+        for name in KlineStore.record_dtype.names[1:]:
+            records[name] = kline_frame[name].values
+        return records
+
+    @staticmethod
+    def records_to_frame(records):
+        columns = {name: records[name] for name in KlineStore.record_dtype.names[1:]}
+        return pd.DataFrame(columns, index=pd.Index(records["open_time"], name="open_time"))
+
+
+def main():
+    import Klines
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    store = KlineStore()
+    btc_klines = Klines.Klines("BTCUSDT", "1h", futures=True, keep_last=True, store=store)
+    logger.debug(btc_klines.get_kline_frame().tail())
+
+    # The second object only downloads klines closed since the first one was created
+    btc_klines = Klines.Klines("BTCUSDT", "1h", futures=True, keep_last=True, store=store)
+    logger.debug(store.load("BTCUSDT", "1h", True, limit=5))
+
+    print("End of the <<KlineStore>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
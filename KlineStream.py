@@ -0,0 +1,234 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import json
+import time
+import threading
+import pandas as pd
+
+from websockets.sync.client import connect
+from websockets.sync.server import serve
+from websockets.exceptions import ConnectionClosed
+
+import Klines
+import KlineSet
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class KlineStream:
+    spot_url = "wss://stream.binance.com:9443/stream?streams="
+    futures_url = "wss://fstream.binance.com/stream?streams="
+    reconnect_delay = 5
+
+    def __init__(self, kline_set, base_url=None, record_path=None, backfill=True):
+        self.kline_set = kline_set
+        self.klines = {(symbol, kline_set.interval): kline_set.get_klines(symbol) for symbol in kline_set.get_symbols()}
+        self.record_path = record_path
+        # Without backfill, klines missed while disconnected are not requested to the REST API, for replays
+        self.backfill = backfill
+        self.callbacks = []
+        self.running = False
+        self.thread = None
+
+        if base_url:
+            self.base_url = base_url
+        elif kline_set.kline_args.get("futures", True):
+            self.base_url = KlineStream.futures_url
+        else:
+            self.base_url = KlineStream.spot_url
+
+        # Every symbol is streamed through a single multiplexed connection
+        streams = [symbol.lower() + "@kline_" + interval for symbol, interval in self.klines]
+        self.url = self.base_url + "/".join(streams)
+
+    def subscribe(self, callback):
+        # callback(klines) is called from the stream thread each time a candle of klines is closed, klines being
+        # changed by this thread, other threads read them within KlineSet.hold()
+        self.callbacks.append(callback)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="KlineStream", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        record_file = open(self.record_path, "a") if self.record_path else None
+        while self.running:
+            try:
+                with connect(self.url) as websocket:
+                    logger.info("Kline stream connected to " + self.base_url)
+                    # Klines closed while disconnected are fetched from the REST API
+                    if self.backfill:
+                        self.kline_set.update_all()
+                    # Recordings start with the history of the klines, so that a replay does not need the REST API
+                    if record_file and record_file.tell() == 0:
+                        self.record_history(record_file)
+                    while self.running:
+                        try:
+                            message = websocket.recv(timeout=1)
+                        except TimeoutError:
+                            continue
+                        if record_file:
+                            record_file.write(message + "\n")
+                        # An unexpected message or a failing callback must not stop the stream
+                        try:
+                            self.process_message(message)
+                        except Exception:
+                            logger.exception("Kline stream could not process a message")
+            except (ConnectionClosed, OSError) as error:
+                logger.warning("Kline stream disconnected : " + str(error))
+            except (Exception, SystemExit):
+                # dl_kline_page() exits on unhandled status codes, the backfill is then tried again after reconnecting
+                logger.exception("Kline stream failed, reconnecting")
+            if self.running:
+                time.sleep(KlineStream.reconnect_delay)
+
+        if record_file:
+            record_file.close()
+
+    def process_message(self, message):
+        message = json.loads(message)
+        data = message.get("data", message)
+        if data.get("e") != "kline":
+            return
+
+        kline = data["k"]
+        klines = self.klines.get((kline["s"], kline["i"]))
+        if not klines:
+            return
+
+        # Callbacks are only given klines closed for the first time, not the ones sent again after a reconnection
+        if klines.apply_kline(KlineStream.kline_to_frame(kline), kline["x"]):
+            for callback in self.callbacks:
+                callback(klines)
+
+    def record_history(self, record_file):
+        for (symbol, interval), klines in self.klines.items():
+            with klines.lock:
+                history = klines.get_closed_klines()
+                for open_time, kline in zip(history.index, history.itertuples(index=False)):
+                    record_file.write(KlineStream.kline_to_message(symbol, interval, open_time, kline._asdict()) + "\n")
+
+    @staticmethod
+    def kline_to_message(symbol, interval, open_time, kline):
+        # Closed kline as sent by Binance, columns missing from kline (ohlcv_only) are sent as 0
+        kline = {"t": int(open_time), "T": int(kline["close_time"]), "s": symbol, "i": interval, "o": str(kline["open"]),
+                 "c": str(kline["close"]), "h": str(kline["high"]), "l": str(kline["low"]), "v": str(kline["volume"]),
+                 "n": int(kline.get("trade_number", 0)), "x": True, "q": str(kline.get("quote_asset_volume", 0)),
+                 "V": str(kline.get("tb_base_av", 0)), "Q": str(kline.get("tb_quote_av", 0))}
+        return json.dumps({"stream": symbol.lower() + "@kline_" + interval, "data": {"e": "kline", "s": symbol, "k": kline}})
+
+    @staticmethod
+    def kline_to_frame(kline):
+        return pd.DataFrame({"open": [float(kline["o"])], "high": [float(kline["h"])], "low": [float(kline["l"])],
+                             "close": [float(kline["c"])], "volume": [float(kline["v"])], "close_time": [int(kline["T"])],
+                             "quote_asset_volume": [float(kline["q"])], "trade_number": [int(kline["n"])],
+                             "tb_base_av": [float(kline["V"])], "tb_quote_av": [float(kline["Q"])]},
+                            index=pd.Index([int(kline["t"])], name="open_time"))
+
+
+class KlineReplayServer:
+    # Local stand-in for the Binance stream, sending back messages recorded by KlineStream(record_path=...)
+
+    def __init__(self, record_path, host="localhost", port=8765, delay=0.0):
+        with open(record_path) as record_file:
+            self.messages = [line.rstrip("\n") for line in record_file if line.strip()]
+        # Symbols and interval of the recorded klines, history included
+        streams = {}
+        for message in self.messages:
+            data = json.loads(message).get("data", {})
+            if data.get("e") == "kline":
+                streams.setdefault(data["k"]["s"], data["k"]["i"])
+        self.symbols = list(streams)
+        self.interval = next(iter(streams.values()), None)
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.server = None
+        self.thread = None
+
+    def get_url(self):
+        return "ws://" + self.host + ":" + str(self.port) + "/stream?streams="
+
+    def get_kline_set(self, **kline_args):
+        # Klines starting empty, their history being the first messages of the replay, without any request to Binance
+        empty_frame = Klines.Klines.decode_klines("[]")
+        return KlineSet.KlineSet(self.symbols, self.interval, kline_frames={symbol: empty_frame for symbol in self.symbols}, **kline_args)
+
+    def get_stream(self, kline_set):
+        return KlineStream(kline_set, base_url=self.get_url(), backfill=False)
+
+    def replay(self, websocket):
+        # The connection is kept open until the client closes it, as Binance would do
+        try:
+            for message in self.messages:
+                websocket.send(message)
+                time.sleep(self.delay)
+            websocket.recv()
+        except ConnectionClosed:
+            pass
+
+    def start(self):
+        self.server = serve(self.replay, self.host, self.port)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="KlineReplayServer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def main():
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    kline_set = KlineSet.KlineSet(["BTCUSDT", "ETHUSDT"], "1m", futures=True, keep_last=True)
+    kline_stream = KlineStream(kline_set, record_path="./outputs/logs/kline_stream.jsonl")
+    kline_stream.subscribe(lambda klines: logger.debug("Candle closed for " + klines.symbol + "\n" + str(klines.get_kline_frame().tail(2))))
+    kline_stream.start()
+    time.sleep(130)
+    kline_stream.stop()
+
+    # The recorded messages are then replayed locally into fresh klines
+    replay_server = KlineReplayServer("./outputs/logs/kline_stream.jsonl")
+    replay_server.start()
+    kline_stream = replay_server.get_stream(replay_server.get_kline_set(futures=True, keep_last=True))
+    kline_stream.subscribe(lambda klines: logger.debug("Replayed candle closed for " + klines.symbol))
+    kline_stream.start()
+    time.sleep(5)
+    kline_stream.stop()
+    replay_server.stop()
+
+    print("End of the <<KlineStream>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
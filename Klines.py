@@ -20,107 +20,405 @@
 ###
 
 import sys
-import requests
+import json
 import datetime
+import threading
+import itertools
+import numpy as np
 import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
+
+import IndicatorCache
+import KlineBuffer
+import KlineResampler
+import RequestScheduler
+import StreamingIndicators
+
 import logging
 logger = logging.getLogger(__name__)
 
 
 class Klines:
-	query_weight_limit = 1100
+	max_backfill_workers = 10
+	timeframe_to_sec = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "2h": 7200, "4h": 14400,
+						"6h": 21600, "8h": 28800, "12h": 43200, "1d": 86400, "3d": 259200, "1w": 604800, "1M": 2419200}
 	kline_column_names = ["open_time", "open", "high", "low", "close", "volume", "close_time", "quote_asset_volume", "trade_number", "tb_base_av", "tb_quote_av"]
+	# Columns kept with ohlcv_only, close_time being needed to know whether a kline is closed
+	ohlcv_column_names = ["open", "high", "low", "close", "volume", "close_time"]
+	integer_column_names = ["open_time", "close_time", "trade_number"]
+	heikin_ashi_column_names = ["ha_close", "ha_open", "ha_high", "ha_low"]
 	max_klines = 1000
+	# Versions given to the klines of every Klines object, a new one each time they change, see get_kline_frame()
+	versions = itertools.count()
 
-	def __init__(self, symbol, interval, start_time=None, end_time=None, limit=500, futures=True, keep_last=False, heikinashi=False):
+	def __init__(self, symbol, interval, start_time=None, end_time=None, limit=500, futures=True, keep_last=False, store=None, capacity=None,
+				price_dtype=np.float64, ohlcv_only=False, kline_frame=None):
 		self.symbol = symbol
 		self.interval = interval
 		self.futures = futures
 		self.keep_last = keep_last
-		self.heikinashi = heikinashi
-
-		self.kline_frame = self.dl_klines(start_time=start_time, end_time=end_time, limit=limit)
+		self.store = store
+		# Klines kept with ohlcv_only are read from the store but never written to it, as other Klines would load
+		# their missing columns
+		self.store_klines = store is not None and not ohlcv_only
+		self.price_dtype = price_dtype
+		self.limit = limit
+		self.column_names = Klines.ohlcv_column_names if ohlcv_only else Klines.kline_column_names[1:]
+		# Held while klines are changed, readers running in another thread than the updates hold it too (KlineSet.hold())
+		self.lock = threading.RLock()
+
+		# A given kline_frame, a replayed stream for instance, is used as history instead of loading it, higher
+		# intervals then being built from it only
+		self.download_intervals = kline_frame is None
+		if kline_frame is not None:
+			self.kline_frame = self.conform_klines(kline_frame)
+		else:
+			self.kline_frame = self.load_klines(start_time=start_time, end_time=end_time, limit=limit)
 
 		if not self.keep_last:
 			self.kline_frame.drop(self.kline_frame.tail(1).index, inplace=True)
 
-		if self.heikinashi:
-			self.heikin_ashi_frame = self.compute_heikin_ashi(self.kline_frame)
+		# With a capacity, only the last klines are kept in a preallocated ring buffer instead of a growing frame
+		self.kline_buffer = None
+		if capacity:
+			self.kline_buffer = KlineBuffer.KlineBuffer.from_frame(self.kline_frame, capacity)
+			self.kline_frame = self.kline_buffer.get_frame()
+
+		self.version = next(Klines.versions)
+		self.save_klines()
+
+		# Open time of the last closed kline, update_klines() and apply_kline() tell when a new one closes
+		closed_klines = self.get_closed_klines()
+		self.last_closed_time = closed_klines.index[-1] if not closed_klines.empty else None
+
+		# Heikin-Ashi candles are built lazily by get_heikin_ashi() and then only extended with new klines
+		self.heikin_ashi_frame = None
+
+		# Higher intervals built locally from this one, see add_interval()
+		self.resamplers = {}
+
+		# Streaming indicators of each interval, see get_indicators()
+		self.indicators = {}
 
 		logger.debug("Klines object created for symbol "+self.symbol)
 
-	def dl_klines(self, start_time=None, end_time=None, limit=500):
-		if self.futures:
-			url = "https://fapi.binance.com/fapi/v1/klines?symbol="+self.symbol+"&interval="+self.interval
-		else:
-			url = "https://api.binance.com/api/v3/klines?symbol="+self.symbol+"&interval="+self.interval
+	def load_klines(self, start_time=None, end_time=None, limit=500):
+		last_stored = self.store.last_open_time(self.symbol, self.interval, self.futures) if self.store else None
+
+		# Without stored klines covering the beginning of the request, everything is downloaded
+		if last_stored is None or (start_time and start_time < self.store.first_open_time(self.symbol, self.interval, self.futures)):
+			return self.dl_klines(start_time=start_time, end_time=end_time, limit=limit)
+
+		stored_klines = self.conform_klines(self.store.load(self.symbol, self.interval, self.futures, start_time=start_time,
+															end_time=end_time, limit=None if start_time else limit))
+		if end_time and end_time <= last_stored:
+			return stored_klines
+
+		# Only the klines missing since the last stored one are downloaded, from the requested start when the store
+		# ends before it
+		download_start = max(start_time, last_stored + 1) if start_time else last_stored + 1
+		new_klines = self.dl_klines(start_time=download_start, end_time=end_time if end_time else Klines.now_to_binance())
+		klines = pd.concat([stored_klines, new_klines])
 
 		if start_time:
-			url += "&startTime="+str(start_time)
-		if end_time:
-			url += "&endTime="+str(end_time)
+			klines = klines.loc[klines.index >= start_time]
+			if end_time:
+				klines = klines.loc[klines.index <= end_time]
+		else:
+			klines = klines.tail(limit)
+
+		logger.debug("Loaded "+str(len(stored_klines))+" stored klines and downloaded "+str(len(new_klines))+" for "+self.symbol)
+		return klines
+
+	def save_klines(self):
+		# Only closed klines are written, the one still open would be stored with its temporary values
+		if self.store_klines:
+			closed_klines = self.kline_frame.loc[self.kline_frame.close_time < Klines.now_to_binance()]
+			# Klines not overlapping the stored ones would leave a gap in the store, load_klines() trims the download
+			# to the requested range when the store ends before it
+			last_stored = self.store.last_open_time(self.symbol, self.interval, self.futures)
+			if last_stored is not None and not closed_klines.empty and closed_klines.index[0] > last_stored:
+				return
+			self.store.append(self.symbol, self.interval, self.futures, closed_klines)
 
+	def dl_klines(self, start_time=None, end_time=None, limit=500):
+		# A time range can span more than Klines.max_klines, it is then downloaded page by page
 		if start_time and end_time:
-			r_json = requests.get(url)
+			return self.backfill_klines(start_time, end_time)
+
+		return self.dl_kline_page(start_time=start_time, end_time=end_time, limit=limit)
+
+	def dl_kline_page(self, start_time=None, end_time=None, limit=500, interval=None):
+		interval = interval if interval else self.interval
+		if self.futures:
+			url = "https://fapi.binance.com/fapi/v1/klines?symbol="+self.symbol+"&interval="+interval
 		else:
-			r_json = requests.get(url+"&limit="+str(limit))
+			url = "https://api.binance.com/api/v3/klines?symbol="+self.symbol+"&interval="+interval
 
-		if int(r_json.headers['X-MBX-USED-WEIGHT-1M']) > Klines.query_weight_limit:
-			sys.exit("API usage reaching limits, shutting down the bot...")
+		if start_time:
+			url += "&startTime="+str(int(start_time))
+		if end_time:
+			url += "&endTime="+str(int(end_time))
 
-		if r_json.status_code == 429 or r_json.status_code == 418:
-			sys.exit("Weight limit of the API excedeed with code"+str(r_json.status_code))
+		# The scheduler holds the request while the weight limit is reached instead of shutting down the bot
+		r_json = RequestScheduler.RequestScheduler.get_scheduler().get(url+"&limit="+str(limit), weight=self.get_request_weight(limit),
+																	priority=RequestScheduler.RequestScheduler.KLINE)
 
 		if r_json.status_code != 200:
 			sys.exit("Exiting because of unhandled status code from http header:"+str(r_json.status_code))
 
-		clean_df = pd.read_json(r_json.content)
+		return Klines.decode_klines(r_json.content, price_dtype=self.price_dtype, column_names=self.column_names)
+
+	def get_request_weight(self, limit):
+		if not self.futures:
+			return 2
+		if limit < 100:
+			return 1
+		if limit < 500:
+			return 2
+		return 5 if limit <= 1000 else 10
+
+	@staticmethod
+	def decode_klines(content, price_dtype=np.float64, column_names=None):
+		# Binance sends an array of arrays mixing integers and numbers as strings, all of them are parsed at once
 		# Remove the last column as it is marked as "ignore" in API doc
-		clean_df.drop(clean_df.columns[-1], axis=1, inplace=True)
-		clean_df.columns = Klines.kline_column_names
-		clean_df.set_index(Klines.kline_column_names[0], inplace=True)
+		values = np.array([kline[:11] for kline in json.loads(content)], dtype=np.float64).reshape(-1, 11)
 
-		return clean_df
+		columns = {}
+		for name in (column_names if column_names else Klines.kline_column_names[1:]):
+			column = values[:, Klines.kline_column_names.index(name)]
+			columns[name] = column.astype(np.int64 if name in Klines.integer_column_names else price_dtype)
+
+		return pd.DataFrame(columns, index=pd.Index(values[:, 0].astype(np.int64), name=Klines.kline_column_names[0]), copy=False)
+
+	def conform_klines(self, klines):
+		# Klines coming from the store or a stream are given the columns and types of this object
+		dtypes = {name: np.int64 if name in Klines.integer_column_names else self.price_dtype for name in self.column_names}
+		return klines[self.column_names].astype(dtypes)
+
+	def backfill_klines(self, start_time, end_time):
+		page_span = Klines.max_klines * Klines.timeframe_to_sec[self.interval] * 1000
+		page_starts = range(int(start_time), int(end_time) + 1, page_span)
+
+		# Pages are fetched concurrently, as many at once as the remaining weight of the current minute allows
+		market = "futures" if self.futures else "spot"
+		remaining_weight = RequestScheduler.RequestScheduler.get_scheduler().get_available(market)
+		workers = max(1, min(len(page_starts), Klines.max_backfill_workers, int(remaining_weight // self.get_request_weight(Klines.max_klines))))
+
+		def dl_page(page_start):
+			return self.dl_kline_page(start_time=page_start, end_time=min(page_start + page_span - 1, int(end_time)), limit=Klines.max_klines)
+
+		if len(page_starts) == 1:
+			return dl_page(page_starts[0])
+
+		logger.debug("Backfilling "+str(len(page_starts))+" pages of klines for "+self.symbol+" with "+str(workers)+" workers")
+
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			pages = list(executor.map(dl_page, page_starts))
+
+		# Pages past the listing date or the current time come back empty
+		klines = pd.concat([page for page in pages if not page.empty] or pages[:1])
+		klines = klines.loc[~klines.index.duplicated(keep='last')]
+
+		return klines.sort_index()
 
 	def update_klines(self):
+		# Returns True when a new kline has been closed since the previous update
+		# Klines are downloaded without holding the lock, it is only held while they are changed
+		last_open_time = self.kline_frame.index[-1]
+
+		# Giving an end_time lets dl_klines() page through gaps bigger than Klines.max_klines
+		now = Klines.now_to_binance()
 		if self.keep_last:
-			new_klines = self.dl_klines(start_time=self.kline_frame.tail(1).index[0], limit=Klines.max_klines)
-			self.kline_frame.drop(self.kline_frame.tail(1).index, inplace=True)
-			self.kline_frame = pd.concat([self.kline_frame, new_klines])
+			new_klines = self.dl_klines(start_time=last_open_time, end_time=now)
+		else:
+			# The last downloaded kline is still open and is not kept
+			new_klines = self.dl_klines(start_time=last_open_time + 1, end_time=now).iloc[:-1]
+
+		with self.lock:
+			last_closed_time = self.last_closed_time
+			# Klines received by a stream meanwhile are replaced by the downloaded ones
+			if not new_klines.empty:
+				while not self.kline_frame.empty and self.kline_frame.index[-1] >= new_klines.index[0]:
+					self.drop_last_kline()
+			self.append_klines(new_klines)
+
+			# The last kept kline may have been replaced, its Heikin-Ashi candle has to be computed again
+			if self.heikin_ashi_frame is not None and not new_klines.empty:
+				self.heikin_ashi_frame = self.heikin_ashi_frame.loc[self.heikin_ashi_frame.index < new_klines.index[0]]
+
+			self.save_klines()
+			self.update_resamplers()
+
+			closed_klines = self.get_closed_klines(after=last_closed_time)
+			if not closed_klines.empty:
+				self.last_closed_time = closed_klines.index[-1]
+			return self.last_closed_time != last_closed_time
+
+	def apply_kline(self, new_kline, closed):
+		# Used by streams, new_kline is a single kline that replaces the last one if it has the same open_time.
+		# Returns True when new_kline is a kline closed for the first time.
+		with self.lock:
+			new_kline = self.conform_klines(new_kline)
+			open_time = new_kline.index[0]
+			last_open_time = self.kline_frame.index[-1] if not self.kline_frame.empty else -1
+
+			if open_time < last_open_time or (not self.keep_last and (open_time == last_open_time or not closed)):
+				return False
+
+			if open_time == last_open_time:
+				self.drop_last_kline()
+			self.append_klines(new_kline)
+
+			if self.heikin_ashi_frame is not None:
+				self.heikin_ashi_frame = self.heikin_ashi_frame.loc[self.heikin_ashi_frame.index < open_time]
+
+			if closed and self.store_klines:
+				self.store.append(self.symbol, self.interval, self.futures, new_kline)
+			if closed:
+				self.update_resamplers()
+
+			if not closed or open_time == self.last_closed_time:
+				return False
+			self.last_closed_time = open_time
+			return True
+
+	def add_interval(self, interval):
+		# The higher interval is aggregated from the klines of this object. The base klines rarely cover enough of its
+		# history : the klines of the higher interval before its current one are downloaded once, along with the base
+		# klines of the current one missing from this object.
+		capacity = self.kline_buffer.capacity if self.kline_buffer is not None else None
+		resampler = KlineResampler.KlineResampler(interval, Klines.timeframe_to_sec[interval], capacity=capacity)
+		missing_klines = None
+		if self.download_intervals:
+			now = Klines.now_to_binance()
+			bucket_start = int(resampler.get_bucket_bounds(np.array([now], dtype=np.int64))[0][0])
+			resampler.seed(self.dl_kline_page(end_time=bucket_start - 1, limit=min(self.limit, Klines.max_klines), interval=interval), bucket_start)
+
+			first_open_time = self.kline_frame.index[0] if not self.kline_frame.empty else now
+			if first_open_time > bucket_start:
+				missing_klines = self.dl_klines(start_time=bucket_start, end_time=first_open_time - 1)
+				missing_klines = missing_klines.loc[missing_klines.close_time < now]
+
+		with self.lock:
+			closed_klines = self.get_closed_klines()
+			if missing_klines is not None:
+				closed_klines = pd.concat([missing_klines.loc[missing_klines.index < closed_klines.index[0]] if not closed_klines.empty
+										   else missing_klines, closed_klines])
+			resampler.add_klines(closed_klines)
+			self.resamplers[interval] = resampler
+			self.version = next(Klines.versions)
+
+	def update_resamplers(self):
+		for resampler in self.resamplers.values():
+			resampler.add_klines(self.get_closed_klines(after=resampler.last_open_time))
+
+	def get_closed_klines(self, after=None, interval=None):
+		if interval is None or interval == self.interval:
+			kline_frame = self.kline_frame
+		else:
+			# Klines of a resampled interval are only kept once their bucket is complete
+			kline_frame = self.resamplers[interval].kline_frame
+			if kline_frame is None:
+				return self.kline_frame.iloc[:0]
+
+		start = kline_frame.index.searchsorted(after, side="right") if after is not None else 0
+		klines = kline_frame.iloc[start:]
+		return klines.loc[klines.close_time < Klines.now_to_binance()]
+
+	def get_last_closed_time(self, interval=None):
+		# Open time of the last closed kline of interval, None before the first one
+		if interval is None or interval == self.interval:
+			return self.last_closed_time
+		kline_frame = self.resamplers[interval].kline_frame
+		return kline_frame.index[-1] if kline_frame is not None and not kline_frame.empty else None
+
+	def get_open_kline(self, interval=None):
+		# Last kline of get_kline_frame(interval) if it is not closed yet, None otherwise
+		kline_frame = self.get_kline_frame(interval)
+		if kline_frame.empty or kline_frame.close_time.iloc[-1] < Klines.now_to_binance():
+			return None
+		return kline_frame.iloc[-1]
+
+	def get_indicators(self, interval=None):
+		interval = interval if interval else self.interval
+		if interval not in self.indicators:
+			self.indicators[interval] = StreamingIndicators.KlineIndicators(self, interval)
+		return self.indicators[interval]
+
+	def append_klines(self, new_klines):
+		if self.kline_buffer is not None:
+			self.kline_buffer.append_frame(new_klines)
+			self.kline_frame = self.kline_buffer.get_frame()
 		else:
-			new_klines = self.dl_klines(start_time=self.kline_frame.tail(1).index[0] + 1, limit=Klines.max_klines)
 			self.kline_frame = pd.concat([self.kline_frame, new_klines])
-			self.kline_frame.drop(self.kline_frame.tail(1).index, inplace=True)
-
-		if self.heikinashi:
-			self.heikin_ashi_frame = self.compute_heikin_ashi(self.kline_frame)
+		self.version = next(Klines.versions)
 
-		return
+	def drop_last_kline(self):
+		if self.kline_buffer is not None:
+			self.kline_buffer.drop_last()
+			self.kline_frame = self.kline_buffer.get_frame()
+		else:
+			self.kline_frame.drop(self.kline_frame.tail(1).index, inplace=True)
+		self.version = next(Klines.versions)
 
-	def get_kline_frame(self):
-		return self.kline_frame
+	def get_kline_frame(self, interval=None):
+		open_klines = None
+		if interval is None or interval == self.interval:
+			kline_frame = self.kline_frame
+		else:
+			if self.keep_last:
+				open_klines = self.kline_frame.loc[self.kline_frame.close_time >= Klines.now_to_binance()]
+			kline_frame = self.resamplers[interval].get_kline_frame(open_klines=open_klines, keep_last=self.keep_last)
+
+		# Used by the indicators module to share indicators computed on the same klines. The last kline of a resampled
+		# interval also changes when base klines get closed, the number of open ones is part of its version.
+		kline_frame.attrs["symbol"] = self.symbol
+		kline_frame.attrs["interval"] = interval if interval else self.interval
+		kline_frame.attrs["version"] = (self.version, len(open_klines) if open_klines is not None else 0)
+		kline_frame.attrs["column_ids"] = {name: IndicatorCache.IndicatorCache.get_column_id(kline_frame[name]) for name in kline_frame.columns}
+		return kline_frame
 
 	def get_heikin_ashi(self):
+		self.heikin_ashi_frame = Klines.compute_heikin_ashi(self.kline_frame, self.heikin_ashi_frame)
 		return self.heikin_ashi_frame
 
 	@staticmethod
-	def compute_heikin_ashi(df):
-		ha = pd.DataFrame()
-		ha['ha_close'] = (df.open + df.high + df.low + df.close) / 4
-		ha_open = [(df.open.iloc[0] + df.close.iloc[0]) / 2]
-		[ha_open.append((ha_open[i] + ha.ha_close.values[i]) / 2) for i in range(0, len(df) - 1)]
-		ha['ha_open'] = ha_open
-		ha['ha_high'] = pd.merge(ha[['ha_open', 'ha_close']], df.high, how='inner', left_index=True, right_index=True).max()
-		ha['ha_low'] = pd.merge(ha[['ha_open', 'ha_close']], df.low, how='inner', left_index=True, right_index=True).min()
+	def compute_heikin_ashi(df, previous_ha=None):
+		# Only klines newer than the last Heikin-Ashi candle are computed, the previous candle seeds the recursion
+		if previous_ha is None or previous_ha.empty:
+			new_df = df
+			first_open = (df.open.iloc[0] + df.close.iloc[0]) / 2 if not df.empty else None
+		else:
+			new_df = df.loc[df.index > previous_ha.index[-1]]
+			first_open = (previous_ha.ha_open.iloc[-1] + previous_ha.ha_close.iloc[-1]) / 2
+
+		if new_df.empty:
+			return previous_ha if previous_ha is not None else pd.DataFrame(columns=Klines.heikin_ashi_column_names)
+
+		ha_close = (new_df.open + new_df.high + new_df.low + new_df.close) / 4
+		# ha_open[i] = (ha_open[i-1] + ha_close[i-1]) / 2 is an exponential mean of factor 1/2 seeded with first_open
+		ha_open_seed = pd.Series([first_open], dtype='float64')
+		ha_open = pd.concat([ha_open_seed, pd.Series(ha_close.values[:-1])]).ewm(alpha=0.5, adjust=False).mean().values
 
-		return ha
+		ha = pd.DataFrame({'ha_close': ha_close.values, 'ha_open': ha_open}, index=new_df.index)
+		ha['ha_high'] = np.maximum(np.maximum(ha.ha_open.values, ha.ha_close.values), new_df.high.values)
+		ha['ha_low'] = np.minimum(np.minimum(ha.ha_open.values, ha.ha_close.values), new_df.low.values)
+
+		if previous_ha is None or previous_ha.empty:
+			return ha
+		return pd.concat([previous_ha.loc[previous_ha.index >= df.index[0]], ha])
 
 	@staticmethod
 	def timestamp_to_binance(timestamp):
 		dt_obj = datetime.datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S,%f')
 		return dt_obj.timestamp() * 1000
 
+	@staticmethod
+	def now_to_binance():
+		return int(datetime.datetime.now().timestamp() * 1000)
+
 
 def main():
 	logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
@@ -131,15 +429,16 @@ def main():
 	start_time1 = Klines.timestamp_to_binance("2021-01-01 00:00:00,00")
 	end_time1 = Klines.timestamp_to_binance(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S,%f'))
 	symbol_data1 = Klines(symbol1, interval1, start_time=start_time1, end_time=end_time1, limit=300, futures=False,
-								keep_last=True, heikinashi=True)
+								keep_last=True)
 
 	symbol2 = "ETHUSDT"
 	interval2 = "1d"
 	symbol_data2 = Klines(symbol2, interval2, start_time=None, end_time=None, limit=500, futures=True,
-								keep_last=False, heikinashi=False)
+								keep_last=False, price_dtype=np.float32, ohlcv_only=True)
 
 	logger.debug(symbol_data1.get_kline_frame().head())
 	logger.debug(symbol_data2.get_kline_frame().head())
+	logger.debug(symbol_data1.get_heikin_ashi().tail())
 	print("End of the <<Klines>> test phase.")
 
 
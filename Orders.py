@@ -19,6 +19,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ###
 
+import time
 import numpy as np
 from datetime import datetime
 
@@ -29,14 +30,21 @@ logger = logging.getLogger(__name__)
 class Orders:
 	LONG = 1
 	SHORT = 2
+	# Many orders are created by long runs, they do not get a __dict__
+	__slots__ = ["symbol", "order_type", "price", "quantity", "timestamp", "active", "take_profit", "stop_loss", "position_book", "opening_fee"]
 
 	def __init__(self, symbol, order_type, price, quantity, take_profit=None, stop_loss=None, tpsl_percent=False):
 		self.symbol = symbol
 		self.order_type = order_type
 		self.price = price
 		self.quantity = quantity
-		self.timestamp = datetime.now()
+		# Milliseconds since epoch, get_timestamp() giving it as a datetime
+		self.timestamp = int(time.time() * 1000)
 		self.active = True
+		# PositionBook of the wallet holding the order while it is active, its levels being kept in sync with the order
+		self.position_book = None
+		# Fee paid by the wallet when the order was opened, in USDT
+		self.opening_fee = 0.0
 
 		if tpsl_percent:
 			self.take_profit = Orders.get_percent_tpsl(self.order_type, 1, self.price, take_profit)
@@ -58,8 +66,10 @@ class Orders:
 			if not self.stop_loss:
 				self.stop_loss = np.inf
 
-		logger.info("New "+odr+" order created for "+self.symbol+" : "+str(self.quantity)+" @ "+str(self.price))
-		logger.debug(self.to_str())
+		# Messages are only formatted when they are logged
+		logger.info("New %s order created for %s : %s @ %s", odr, self.symbol, self.quantity, self.price)
+		if logger.isEnabledFor(logging.DEBUG):
+			logger.debug(self.to_str())
 
 	@staticmethod
 	def get_percent_tpsl(order_type, side, base_price, coefficient):
@@ -71,11 +81,21 @@ class Orders:
 	def set_active(self, active):
 		self.active = active
 
+	def set_position_book(self, position_book):
+		self.position_book = position_book
+
+	def set_opening_fee(self, opening_fee):
+		self.opening_fee = opening_fee
+
 	def set_take_profit(self, take_profit):
 		self.take_profit = take_profit
+		if self.position_book is not None:
+			self.position_book.update_levels(self)
 
 	def set_stop_loss(self, stop_loss):
 		self.stop_loss = stop_loss
+		if self.position_book is not None:
+			self.position_book.update_levels(self)
 
 	def get_symbol(self):
 		return self.symbol
@@ -90,11 +110,17 @@ class Orders:
 		return self.quantity
 
 	def get_timestamp(self):
+		return datetime.fromtimestamp(self.timestamp / 1000)
+
+	def get_open_time(self):
 		return self.timestamp
 
 	def get_active(self):
 		return self.active
 
+	def get_opening_fee(self):
+		return self.opening_fee
+
 	def get_take_profit(self):
 		return self.take_profit
 
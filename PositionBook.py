@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import numpy as np
+
+import Orders
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class PositionBook:
+    # Active orders indexed by (symbol, order_type), closed ones being recorded by the TradeLedger of the wallet.
+    # Take profit and stop loss of active orders are also kept in arrays, one slot per order, so that they are all
+    # checked at once. They are copied from the order when it is opened and whenever its setters change them.
+    initial_slots = 16
+
+    def __init__(self):
+        self.positions = {}
+
+        self.slots = {}
+        self.free_slots = list(range(PositionBook.initial_slots - 1, -1, -1))
+        self.used = np.zeros(PositionBook.initial_slots, dtype=bool)
+        self.symbols = np.empty(PositionBook.initial_slots, dtype=object)
+        self.order_types = np.zeros(PositionBook.initial_slots, dtype=np.int8)
+        self.take_profits = np.zeros(PositionBook.initial_slots)
+        self.stop_losses = np.zeros(PositionBook.initial_slots)
+        self.open_times = np.zeros(PositionBook.initial_slots, dtype=np.int64)
+
+    def grow(self):
+        # Slots are doubled when they are all used
+        size = len(self.used)
+        self.used = np.r_[self.used, np.zeros(size, dtype=bool)]
+        self.symbols = np.r_[self.symbols, np.empty(size, dtype=object)]
+        self.order_types = np.r_[self.order_types, np.zeros(size, dtype=np.int8)]
+        self.take_profits = np.r_[self.take_profits, np.zeros(size)]
+        self.stop_losses = np.r_[self.stop_losses, np.zeros(size)]
+        self.open_times = np.r_[self.open_times, np.zeros(size, dtype=np.int64)]
+        self.free_slots = list(range(2 * size - 1, size - 1, -1))
+
+    def open(self, order):
+        key = (order.get_symbol(), order.get_order_type())
+        if key in self.positions:
+            raise ValueError("An order is already active for " + key[0] + " with order type " + str(key[1]))
+        self.positions[key] = order
+
+        if not self.free_slots:
+            self.grow()
+        slot = self.free_slots.pop()
+        self.slots[key] = slot
+        self.used[slot] = True
+        self.symbols[slot] = order.get_symbol()
+        self.order_types[slot] = order.get_order_type()
+        self.take_profits[slot] = order.get_take_profit()
+        self.stop_losses[slot] = order.get_stop_loss()
+        self.open_times[slot] = order.get_open_time()
+        order.set_position_book(self)
+
+    def close(self, order):
+        key = (order.get_symbol(), order.get_order_type())
+        del self.positions[key]
+        order.set_position_book(None)
+
+        slot = self.slots.pop(key)
+        self.used[slot] = False
+        self.symbols[slot] = None
+        self.free_slots.append(slot)
+
+    def update_levels(self, order):
+        # Called by the setters of order
+        slot = self.slots[(order.get_symbol(), order.get_order_type())]
+        self.take_profits[slot] = order.get_take_profit()
+        self.stop_losses[slot] = order.get_stop_loss()
+
+    def get_levels(self):
+        # Symbols, order types, take profits, stop losses and open times of the active orders
+        slots = np.flatnonzero(self.used)
+        return (self.symbols[slots], self.order_types[slots], self.take_profits[slots], self.stop_losses[slots],
+                self.open_times[slots])
+
+    def get(self, symbol, order_type):
+        return self.positions.get((symbol, order_type))
+
+    def get_position(self, symbol):
+        # Active order of symbol whatever its order type, a wallet never being long and short at the same time
+        return self.positions.get((symbol, Orders.Orders.LONG)) or self.positions.get((symbol, Orders.Orders.SHORT))
+
+    def get_actives(self):
+        return list(self.positions.values())
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def main():
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    position_book = PositionBook()
+    order = Orders.Orders("BTCUSDT", Orders.Orders.LONG, 40000, 0.01)
+    position_book.open(order)
+    position_book.open(Orders.Orders("ETHUSDT", Orders.Orders.SHORT, 1500, 0.5))
+    order.set_stop_loss(39000)
+    logger.debug(position_book.get_position("BTCUSDT").to_str() + " - " + str(position_book.get_levels()))
+    position_book.close(order)
+    logger.debug(str(len(position_book)) + " active orders")
+
+    print("End of the <<PositionBook>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import time
+import threading
+
+import RequestScheduler
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class PriceService:
+    price_urls = {"spot": "https://api.binance.com/api/v3/ticker/price",
+                  "futures": "https://fapi.binance.com/fapi/v1/ticker/price"}
+    # Weight of a request without symbol, giving the price of every symbol of the market
+    snapshot_weights = {"spot": 4, "futures": 2}
+    # Seconds during which the same prices are given to every caller
+    ttl = 5.0
+
+    services = {}
+    services_lock = threading.Lock()
+
+    def __init__(self, market, ttl=None):
+        self.market = market
+        self.ttl = ttl if ttl is not None else PriceService.ttl
+        self.prices = {}
+        self.snapshot_time = None
+        self.lock = threading.Lock()
+        self.snapshot_requests = 0
+        self.symbol_requests = 0
+
+    @staticmethod
+    def get_service(futures=False):
+        # One service per market, shared by every wallet
+        market = "futures" if futures else "spot"
+        with PriceService.services_lock:
+            if market not in PriceService.services:
+                PriceService.services[market] = PriceService(market)
+            return PriceService.services[market]
+
+    def refresh(self):
+        r_json = RequestScheduler.RequestScheduler.get_scheduler().get(PriceService.price_urls[self.market],
+                                                                       weight=PriceService.snapshot_weights[self.market],
+                                                                       priority=RequestScheduler.RequestScheduler.PRICE)
+        self.prices = {row["symbol"]: float(row["price"]) for row in r_json.json()}
+        self.snapshot_time = time.monotonic()
+        self.snapshot_requests += 1
+        logger.debug("Prices of " + str(len(self.prices)) + " " + self.market + " symbols refreshed")
+
+    def get_snapshot(self):
+        # Callers waiting while the snapshot is refreshed get the new one, without sending another request
+        with self.lock:
+            if self.snapshot_time is None or time.monotonic() - self.snapshot_time >= self.ttl:
+                self.refresh()
+            return self.prices
+
+    def get_price(self, symbol):
+        return self.get_prices([symbol])[symbol]
+
+    def get_prices(self, symbols):
+        # Prices of symbols taken from the same snapshot, symbols missing from it are requested on their own
+        snapshot = self.get_snapshot()
+        prices = {}
+        for symbol in symbols:
+            if symbol in snapshot:
+                prices[symbol] = snapshot[symbol]
+            else:
+                logger.warning(symbol + " missing from the " + self.market + " price snapshot, requesting it alone")
+                prices[symbol] = self.request_price(symbol)
+        return prices
+
+    def request_price(self, symbol):
+        r_json = RequestScheduler.RequestScheduler.get_scheduler().get(PriceService.price_urls[self.market] + "?symbol=" + symbol,
+                                                                       weight=1, priority=RequestScheduler.RequestScheduler.PRICE)
+        self.symbol_requests += 1
+        return float(r_json.json()['price'])
+
+    def to_str(self):
+        return "Price service (" + self.market + ") : " + str(self.snapshot_requests) + " snapshots, " \
+               + str(self.symbol_requests) + " single symbol requests"
+
+
+def main():
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    price_service = PriceService.get_service(futures=True)
+    for i in range(3):
+        logger.debug(price_service.get_prices(["BTCUSDT", "ETHUSDT", "BNBUSDT"]))
+    logger.debug(price_service.to_str())
+
+    print("End of the <<PriceService>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
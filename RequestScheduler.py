@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import time
+import heapq
+import itertools
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    # capacity is the limit of Binance, share being the part of its refill rate this process may use when other
+    # processes send requests from the same IP
+
+    def __init__(self, capacity, period, share=1.0):
+        self.capacity = capacity
+        self.period = period
+        self.refill_rate = capacity * share / period
+        self.tokens = capacity * share
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+    def wait_time(self, weight, reserve=0.0):
+        # Time before weight tokens can be taken while leaving reserve * capacity in the bucket
+        self.refill()
+        missing = min(weight + reserve * self.capacity, self.capacity) - self.tokens
+        wait = max(0.0, missing / self.refill_rate)
+        return max(wait, self.blocked_until - time.monotonic())
+
+    def set_share(self, share):
+        self.refill()
+        self.refill_rate = self.capacity * share / self.period
+        self.tokens = min(self.tokens, self.capacity * share)
+
+    def take(self, weight):
+        self.tokens -= weight
+
+    def sync(self, used_weight):
+        # The weight used as counted by Binance for the whole IP, which also includes requests made by other processes
+        self.refill()
+        self.tokens = min(self.tokens, self.capacity - used_weight)
+
+    def block(self, seconds):
+        self.blocked_until = time.monotonic() + seconds
+        self.tokens = 0.0
+
+
+class RequestScheduler:
+    # Priorities, lower values being sent first
+    ORDER = 0
+    PRICE = 1
+    KLINE = 2
+
+    # Share of the bucket a priority has to leave untouched, so that orders can always be placed
+    priority_reserve = {ORDER: 0.0, PRICE: 0.05, KLINE: 0.1}
+
+    # Limits kept slightly below the ones of Binance : weight per minute for each market, orders per 10 seconds
+    bucket_limits = {"spot": (1100, 60), "futures": (2200, 60), "orders": (40, 10)}
+    weight_headers = {"spot": "X-MBX-USED-WEIGHT-1M", "futures": "X-MBX-USED-WEIGHT-1M"}
+    # Share of the weight refill rate of this process, the weight used being synced with the headers of Binance
+    weight_share = 1.0
+
+    request_timeout = 10
+    max_retries = 5
+    default_retry_after = 60
+
+    scheduler = None
+    scheduler_lock = threading.Lock()
+
+    def __init__(self):
+        self.buckets = {name: TokenBucket(capacity, period, RequestScheduler.weight_share if name in RequestScheduler.weight_headers else 1.0)
+                        for name, (capacity, period) in RequestScheduler.bucket_limits.items()}
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.counter = itertools.count()
+
+        # Connections are kept alive and shared by every caller, including the ones running concurrently
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=64))
+
+    @staticmethod
+    def get_scheduler():
+        with RequestScheduler.scheduler_lock:
+            if RequestScheduler.scheduler is None:
+                RequestScheduler.scheduler = RequestScheduler()
+            return RequestScheduler.scheduler
+
+    @staticmethod
+    def get_market(url):
+        return "futures" if "fapi." in url else "spot"
+
+    def set_weight_share(self, share):
+        # Processes sending requests from the same IP each refill their buckets at their share of the rate
+        with self.condition:
+            for market in RequestScheduler.weight_headers:
+                self.buckets[market].set_share(share)
+            self.condition.notify_all()
+
+    def get_available(self, market):
+        with self.condition:
+            self.buckets[market].refill()
+            return max(0.0, self.buckets[market].tokens)
+
+    def acquire(self, costs, priority):
+        # Requests wait in a heap so that the highest priority one always gets the next tokens
+        entry = (priority, next(self.counter))
+        reserve = RequestScheduler.priority_reserve[priority]
+        with self.condition:
+            heapq.heappush(self.waiting, entry)
+            while True:
+                wait = 0.0
+                if self.waiting[0] == entry:
+                    wait = max(self.buckets[name].wait_time(weight, reserve) for name, weight in costs.items())
+                    if wait == 0.0:
+                        break
+                self.condition.wait(timeout=wait if wait else None)
+
+            heapq.heappop(self.waiting)
+            for name, weight in costs.items():
+                self.buckets[name].take(weight)
+            self.condition.notify_all()
+
+    def request(self, method, url, weight=1, priority=KLINE, order=False, **kwargs):
+        market = RequestScheduler.get_market(url)
+        costs = {market: weight}
+        if order:
+            costs["orders"] = 1
+        kwargs.setdefault("timeout", RequestScheduler.request_timeout)
+
+        for attempt in range(RequestScheduler.max_retries):
+            self.acquire(costs, priority)
+            response = self.session.request(method, url, **kwargs)
+
+            with self.condition:
+                used_weight = response.headers.get(RequestScheduler.weight_headers[market])
+                if used_weight:
+                    self.buckets[market].sync(int(used_weight))
+
+                # Rather than stopping the bot, requests are held until Binance accepts them again
+                if response.status_code not in (418, 429):
+                    return response
+                retry_after = int(response.headers.get("Retry-After", RequestScheduler.default_retry_after))
+                self.buckets[market].block(retry_after)
+                self.condition.notify_all()
+
+            logger.warning("Request limit reached with code " + str(response.status_code) + ", waiting " + str(retry_after) + "s")
+
+        return response
+
+    def get(self, url, weight=1, priority=KLINE, **kwargs):
+        return self.request("GET", url, weight=weight, priority=priority, **kwargs)
+
+    def post(self, url, weight=1, priority=ORDER, order=True, **kwargs):
+        return self.request("POST", url, weight=weight, priority=priority, order=order, **kwargs)
+
+
+def main():
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    scheduler = RequestScheduler.get_scheduler()
+    for i in range(5):
+        response = scheduler.get("https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT", priority=RequestScheduler.PRICE)
+        logger.debug(response.json())
+    logger.debug("Remaining spot weight : " + str(scheduler.get_available("spot")))
+
+    print("End of the <<RequestScheduler>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
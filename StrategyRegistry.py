@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import json
+import numpy as np
+
+import indicators as ind
+import strategies as strat
+import Klines
+import KlinePanel
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class StrategyRegistry:
+    # Strategy types : function giving the indicators needed for some parameters, and function giving the signal
+    strategy_types = {"golden_cross": (strat.golden_cross_inputs, strat.golden_cross_inputs_signal),
+                      "sar_strategy": (strat.sar_strategy_inputs, strat.sar_strategy_inputs_signal)}
+    # Indicators that strategies can declare, computed on every symbol of a panel, with the candle columns they use
+    indicator_functions = {"sma": (ind.get_panel_sma, ["close"]), "wma": (ind.get_panel_wma, ["close"]),
+                           "sar": (ind.get_panel_sar, ["high", "low"])}
+    # Indicators given on raw candles by the StreamingIndicators of each Klines, updated one closed kline at a time
+    streamed_indicators = ["sma", "wma", "sar"]
+    candle_types = ["raw", "heikin_ashi"]
+    heikin_ashi_columns = {"ha_open": "open", "ha_high": "high", "ha_low": "low", "ha_close": "close"}
+
+    def __init__(self, strategy_configs, timeframes):
+        # Strategies without a timeframe are run on each of timeframes
+        self.strategies = []
+        for config in strategy_configs:
+            if not config.get("active", True):
+                continue
+            if config["strategy"] not in StrategyRegistry.strategy_types:
+                raise ValueError("Unknown strategy : " + config["strategy"])
+            if config.get("candles", "raw") not in StrategyRegistry.candle_types:
+                raise ValueError("Unknown candles for " + config["strategy"] + " : " + config["candles"])
+
+            for timeframe in ([config["timeframe"]] if "timeframe" in config else timeframes):
+                strategy = {"name": config.get("name", config["strategy"]), "strategy": config["strategy"],
+                            "timeframe": timeframe, "candles": config.get("candles", "raw"),
+                            "amount": config.get("amount", 1000.0), "params": config.get("params", {})}
+                get_inputs = StrategyRegistry.strategy_types[strategy["strategy"]][0]
+                strategy["inputs"] = {name: (indicator, tuple(sorted(params.items())))
+                                      for name, (indicator, params) in get_inputs(**strategy["params"]).items()}
+                self.strategies.append(strategy)
+
+        self.graph = self.build_graph()
+        # Open time of the last closed kline each (timeframe, candles, symbol) has been evaluated on
+        self.evaluated_times = {}
+        self.evaluations = 0
+        self.skipped_evaluations = 0
+        self.computed_indicators = 0
+
+    @staticmethod
+    def register(name, get_inputs, get_signal):
+        StrategyRegistry.strategy_types[name] = (get_inputs, get_signal)
+
+    @staticmethod
+    def register_indicator(name, function, column_names):
+        # A registered indicator is always computed by function, even if a streaming indicator has the same name
+        StrategyRegistry.indicator_functions[name] = (function, column_names)
+        if name in StrategyRegistry.streamed_indicators:
+            StrategyRegistry.streamed_indicators.remove(name)
+
+    @staticmethod
+    def load(path, timeframes):
+        with open(path) as config_file:
+            config = json.load(config_file)
+        return StrategyRegistry(config["strategies"], timeframes)
+
+    def build_graph(self):
+        # Candles (timeframe, candle type) -> unique indicators computed on them, and strategies using them.
+        # Candles and indicators that no active strategy declares are never computed.
+        graph = {}
+        for strategy in self.strategies:
+            node = graph.setdefault((strategy["timeframe"], strategy["candles"]), {"indicators": {}, "strategies": []})
+            for indicator_key in strategy["inputs"].values():
+                if indicator_key[0] not in StrategyRegistry.indicator_functions:
+                    raise ValueError("Unknown indicator for " + strategy["name"] + " : " + indicator_key[0])
+                node["indicators"][indicator_key] = None
+            node["strategies"].append(strategy)
+
+        # Position of each strategy in the order run_cycle() evaluates them, see sort_intents()
+        for position, strategy in enumerate(strategy for node in graph.values() for strategy in node["strategies"]):
+            strategy["position"] = position
+        return graph
+
+    def get_timeframes(self):
+        return list(dict.fromkeys(timeframe for timeframe, candles in self.graph))
+
+    @staticmethod
+    def get_candle_panel(kline_set, timeframe, candles, symbols):
+        if candles == "heikin_ashi":
+            frames = {}
+            for symbol in symbols:
+                klines = kline_set.get_klines(symbol)
+                if timeframe == klines.interval:
+                    heikin_ashi = klines.get_heikin_ashi()
+                else:
+                    heikin_ashi = Klines.Klines.compute_heikin_ashi(klines.get_kline_frame(timeframe))
+                frames[symbol] = heikin_ashi.rename(columns=StrategyRegistry.heikin_ashi_columns)
+            return KlinePanel.KlinePanel.from_frames(frames, column_names=["open", "high", "low", "close"], interval=timeframe)
+
+        frames = {symbol: kline_set.get_kline_frame(symbol, timeframe) for symbol in symbols}
+        return KlinePanel.KlinePanel.from_frames(frames, interval=timeframe)
+
+    @staticmethod
+    def is_streamed(candles, indicator_keys):
+        # Streamed indicators are not computed again over the whole history at every cycle. Heikin-Ashi candles and
+        # registered indicators are still computed on a panel of every kline.
+        return candles == "raw" and all(key[0] in StrategyRegistry.streamed_indicators for key in indicator_keys)
+
+    @staticmethod
+    def get_streamed_inputs(kline_set, timeframe, indicator_keys, symbols):
+        # Panel of the last two klines of symbols, the only ones signals are read from, and values of the indicators
+        # on these klines, the last one possibly not closed yet
+        frames = {}
+        for symbol in symbols:
+            kline_frame = kline_set.get_kline_frame(symbol, timeframe)
+            if not kline_frame.empty:
+                frames[symbol] = kline_frame
+        panel = KlinePanel.KlinePanel.from_tails(frames, 2, interval=timeframe)
+
+        values = {indicator_key: np.full(panel.shape(), np.nan) for indicator_key in indicator_keys}
+        for row, symbol in enumerate(panel.get_symbols()):
+            kline_indicators = kline_set.get_klines(symbol).get_indicators(timeframe)
+            for indicator_key in indicator_keys:
+                values[indicator_key][row] = kline_indicators.get_last_values(indicator_key[0], **dict(indicator_key[1]))
+        return panel, values
+
+    def get_new_symbols(self, kline_set, timeframe, candles, symbols):
+        # Symbols having closed a kline of timeframe since they were last evaluated on it, so that strategies are
+        # evaluated, and orders pushed, once per kline
+        new_symbols = []
+        for symbol in symbols:
+            last_closed_time = kline_set.get_klines(symbol).get_last_closed_time(timeframe)
+            if last_closed_time is None or self.evaluated_times.get((timeframe, candles, symbol)) == last_closed_time:
+                continue
+            self.evaluated_times[(timeframe, candles, symbol)] = last_closed_time
+            new_symbols.append(symbol)
+        return new_symbols
+
+    def run_cycle(self, kline_set, symbols=None):
+        # Order intents given by the last klines of symbols, as dicts of strategy, timeframe, symbol, order_type and
+        # amount, in the order of the configuration. Symbols without a new closed kline are skipped.
+        symbols = symbols if symbols is not None else kline_set.get_symbols()
+        intents = []
+        for (timeframe, candles), node in self.graph.items():
+            # Klines changed by a KlineStream thread are held while they are read, the panel being a copy of them
+            streamed = StrategyRegistry.is_streamed(candles, node["indicators"])
+            with kline_set.hold(symbols):
+                new_symbols = self.get_new_symbols(kline_set, timeframe, candles, symbols)
+                if not new_symbols:
+                    panel = None
+                elif streamed:
+                    panel, values = StrategyRegistry.get_streamed_inputs(kline_set, timeframe, node["indicators"], new_symbols)
+                else:
+                    panel = StrategyRegistry.get_candle_panel(kline_set, timeframe, candles, new_symbols)
+            self.skipped_evaluations += (len(symbols) - len(new_symbols)) * len(node["strategies"])
+            if not new_symbols or not panel.get_symbols():
+                continue
+
+            # Each indicator is computed once, whatever the number of strategies declaring it
+            if not streamed:
+                values = {}
+                for indicator_key in node["indicators"]:
+                    function, column_names = StrategyRegistry.indicator_functions[indicator_key[0]]
+                    values[indicator_key] = function(*[panel.get_column(name) for name in column_names], **dict(indicator_key[1]))
+            self.computed_indicators += len(node["indicators"])
+
+            for strategy in node["strategies"]:
+                get_signal = StrategyRegistry.strategy_types[strategy["strategy"]][1]
+                inputs = {name: values[indicator_key] for name, indicator_key in strategy["inputs"].items()}
+                signal = get_signal(panel, inputs, **strategy["params"])
+                self.evaluations += len(panel.get_symbols())
+
+                for row in np.flatnonzero(signal[:, -1]):
+                    intents.append({"strategy": strategy["name"], "timeframe": timeframe, "symbol": panel.symbols[row],
+                                    "order_type": strat.signal_order_types[signal[row, -1]], "amount": strategy["amount"],
+                                    "position": strategy["position"]})
+        return intents
+
+    @staticmethod
+    def sort_intents(intents, symbols):
+        # Intents given by several run_cycle() calls on parts of symbols, in the order a single call would give them
+        symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        return sorted(intents, key=lambda intent: (intent["position"], symbol_index[intent["symbol"]]))
+
+    def get_stats(self):
+        return {"evaluations": self.evaluations, "skipped_evaluations": self.skipped_evaluations,
+                "computed_indicators": self.computed_indicators}
+
+    @staticmethod
+    def stats_to_str(stats):
+        return "Strategy registry : " + str(stats["evaluations"]) + " strategy evaluations, " + str(stats["skipped_evaluations"]) \
+               + " skipped without a new kline, " + str(stats["computed_indicators"]) + " indicators computed"
+
+    def to_str(self):
+        return StrategyRegistry.stats_to_str(self.get_stats())
+
+
+def main():
+    import KlineSet
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    kline_set = KlineSet.KlineSet(["BTCUSDT", "ETHUSDT"], "15m", futures=True, keep_last=True)
+    kline_set.add_interval("1h")
+    registry = StrategyRegistry.load("./strategies.json", ["15m", "1h"])
+    logger.debug(registry.run_cycle(kline_set))
+    logger.debug(registry.to_str())
+
+    kline_set.close()
+    print("End of the <<StrategyRegistry>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
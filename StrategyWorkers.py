@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import os
+import traceback
+import multiprocessing
+
+import KlineSet
+import KlineStore
+import RequestScheduler
+import StrategyRegistry
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def run_worker(connection, index, weight_share, symbols, interval, timeframes, strategy_config, strategy_timeframes,
+               store_directory, kline_args):
+    # Klines of the symbols of a worker stay in its process, only order intents are sent back to the main process
+    logging.basicConfig(filename="./outputs/logs/strategy_worker" + str(index) + ".log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+    try:
+        # Workers share the weight limits of Binance with the main process, each one refilling at its share of the rate
+        RequestScheduler.RequestScheduler.weight_share = weight_share
+        store = KlineStore.KlineStore(store_directory) if store_directory else None
+        kline_set = KlineSet.KlineSet(symbols, interval, store=store, **kline_args)
+        for timeframe in timeframes:
+            if timeframe != interval:
+                kline_set.add_interval(timeframe)
+        registry = StrategyRegistry.StrategyRegistry.load(strategy_config, strategy_timeframes)
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+        return
+    connection.send(("ready", None))
+
+    # Every symbol is given to the registry, which only evaluates the ones having a new closed kline and counts the
+    # others as skipped
+    while connection.recv() != "close":
+        try:
+            kline_set.update_all()
+            intents = registry.run_cycle(kline_set)
+            connection.send(("intents", (intents, registry.get_stats())))
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+
+    kline_set.close()
+
+
+class StrategyWorkers:
+    # Symbols are shared between processes that each keep the klines of their symbols, update them and run the
+    # strategies of a StrategyRegistry on them at every cycle
+    def __init__(self, symbols, interval, timeframes, strategy_config, strategy_timeframes, processes=None,
+                 store_directory=None, **kline_args):
+        self.symbols = list(symbols)
+        processes = min(processes if processes else os.cpu_count(), len(self.symbols))
+        # Processes are spawned so that they do not inherit the threads and connections of the main process
+        context = multiprocessing.get_context("spawn")
+        # The main process keeps requesting prices, it refills its buckets at the same share of the rate as a worker
+        weight_share = 1 / (processes + 1)
+        RequestScheduler.RequestScheduler.get_scheduler().set_weight_share(weight_share)
+
+        self.workers = []
+        for index in range(processes):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=run_worker, daemon=True,
+                                      args=(worker_connection, index, weight_share, self.symbols[index::processes], interval,
+                                            timeframes, strategy_config, strategy_timeframes, store_directory, kline_args))
+            process.start()
+            self.workers.append((process, connection))
+
+        for process, connection in self.workers:
+            StrategyWorkers.receive(connection)
+        self.stats = [None] * len(self.workers)
+
+        logger.debug("StrategyWorkers created for " + str(len(self.symbols)) + " symbols on " + str(processes) + " processes")
+
+    @staticmethod
+    def receive(connection):
+        try:
+            status, content = connection.recv()
+        except EOFError:
+            raise RuntimeError("Strategy worker stopped unexpectedly")
+        if status == "error":
+            raise RuntimeError("Strategy worker failed :\n" + content)
+        return content
+
+    def run_cycle(self):
+        # Order intents of every worker, in the order given by a single StrategyRegistry over all symbols
+        for process, connection in self.workers:
+            connection.send("cycle")
+
+        intents = []
+        for index, (process, connection) in enumerate(self.workers):
+            worker_intents, self.stats[index] = StrategyWorkers.receive(connection)
+            intents.extend(worker_intents)
+        return StrategyRegistry.StrategyRegistry.sort_intents(intents, self.symbols)
+
+    def get_stats(self):
+        stats = [worker_stats for worker_stats in self.stats if worker_stats]
+        return {name: sum(worker_stats[name] for worker_stats in stats) for name in ["evaluations", "skipped_evaluations", "computed_indicators"]}
+
+    def to_str(self):
+        return StrategyRegistry.StrategyRegistry.stats_to_str(self.get_stats())
+
+    def close(self):
+        for process, connection in self.workers:
+            connection.send("close")
+        for process, connection in self.workers:
+            process.join()
+
+
+def main():
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "MKRUSDT", "ALGOUSDT", "SOLUSDT", "DOGEUSDT", "LINKUSDT"]
+    strategy_workers = StrategyWorkers(symbols, "15m", ["15m", "1h"], "./strategies.json", ["15m", "1h"], processes=2,
+                                       futures=True, keep_last=True)
+    logger.debug(strategy_workers.run_cycle())
+    logger.debug(strategy_workers.to_str())
+
+    strategy_workers.close()
+    print("End of the <<StrategyWorkers>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import collections
+
+import logging
+logger = logging.getLogger(__name__)
+
+nan = float("nan")
+
+
+class StreamingIndicator:
+    # Indicators updated one closed kline at a time in constant time, following the TA-Lib computations so that the
+    # values are the same as the ones of the matching indicators function run over the whole history.
+    # step() computes the next value from the current state without changing it, so that the value of a kline that
+    # is not closed yet can be read with peek() and computed again once the kline closes.
+    inputs = ("close",)
+
+    def __init__(self, window=0):
+        self.state = None
+        self.count = 0
+        # Last inputs needed by the indicator, older ones being dropped as new ones come in
+        self.window = collections.deque(maxlen=window)
+        self.value = nan
+        self.previous = nan
+
+    def step(self, *inputs):
+        raise NotImplementedError
+
+    def update(self, *inputs):
+        value, self.state = self.step(*inputs)
+        self.window.append(inputs[0] if len(inputs) == 1 else inputs)
+        self.count += 1
+        self.previous = self.value
+        self.value = value
+        return value
+
+    def peek(self, *inputs):
+        return self.step(*inputs)[0]
+
+    def seed(self, kline_frame):
+        columns = [kline_frame[name].values.tolist() for name in self.inputs]
+        for row in zip(*columns):
+            self.update(*row)
+        return self
+
+
+class SMA(StreamingIndicator):
+
+    def __init__(self, timeperiod=30):
+        super().__init__(window=timeperiod - 1)
+        self.timeperiod = timeperiod
+        # Sum of the last timeperiod - 1 values
+        self.state = 0.0
+
+    def step(self, close):
+        total = self.state + close
+        if self.count < self.timeperiod - 1:
+            return nan, total
+        oldest = self.window[0] if self.window.maxlen else close
+        return total / self.timeperiod, total - oldest
+
+
+class WMA(StreamingIndicator):
+
+    def __init__(self, timeperiod=30):
+        super().__init__(window=timeperiod)
+        self.timeperiod = timeperiod
+        self.divider = (timeperiod * (timeperiod + 1)) >> 1
+        # Plain sum, weighted sum and value leaving the window at the next step
+        self.state = (0.0, 0.0, 0.0)
+
+    def step(self, close):
+        period_sub, period_sum, trailing_value = self.state
+        if self.timeperiod == 1:
+            return close, self.state
+        if self.count < self.timeperiod - 1:
+            return nan, (period_sub + close, period_sum + close * (self.count + 1), trailing_value)
+
+        period_sub += close
+        period_sub -= trailing_value
+        period_sum += close * self.timeperiod
+        value = period_sum / self.divider
+        # The oldest value of the window including close leaves it at the next step
+        oldest = self.window[-(self.timeperiod - 1)]
+        return value, (period_sub, period_sum - period_sub, oldest)
+
+
+class EMA(StreamingIndicator):
+
+    def __init__(self, timeperiod=30, k=None):
+        super().__init__(window=timeperiod - 1)
+        self.timeperiod = timeperiod
+        self.k = k if k else 2.0 / (timeperiod + 1)
+
+    def step(self, close):
+        if self.count < self.timeperiod - 1:
+            return nan, None
+        if self.count == self.timeperiod - 1:
+            # First value is the average of the first timeperiod values
+            value = (sum(self.window) + close) / self.timeperiod
+        else:
+            value = ((close - self.state) * self.k) + self.state
+        return value, value
+
+
+class RSI(StreamingIndicator):
+
+    def __init__(self, timeperiod=60):
+        super().__init__(window=1)
+        self.timeperiod = timeperiod
+        # Wilder averages of gains and losses
+        self.state = (0.0, 0.0)
+
+    def step(self, close):
+        if self.count == 0:
+            return nan, self.state
+
+        prev_gain, prev_loss = self.state
+        change = close - self.window[-1]
+        if self.count > self.timeperiod:
+            prev_gain *= self.timeperiod - 1
+            prev_loss *= self.timeperiod - 1
+        if change < 0:
+            prev_loss -= change
+        else:
+            prev_gain += change
+
+        if self.count < self.timeperiod:
+            return nan, (prev_gain, prev_loss)
+        prev_gain /= self.timeperiod
+        prev_loss /= self.timeperiod
+
+        total = prev_gain + prev_loss
+        value = 100.0 * (prev_gain / total) if not -1e-8 < total < 1e-8 else 0.0
+        return value, (prev_gain, prev_loss)
+
+
+class MACD(StreamingIndicator):
+
+    def __init__(self, fastperiod=12, slowperiod=26, signalperiod=9):
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        super().__init__(window=slowperiod - 1)
+        self.fastperiod = fastperiod
+        self.slowperiod = slowperiod
+        self.signalperiod = signalperiod
+        self.fast_k = 2.0 / (fastperiod + 1)
+        self.slow_k = 2.0 / (slowperiod + 1)
+        self.signal_k = 2.0 / (signalperiod + 1)
+        # MACD values averaged to seed the signal line
+        self.macd_values = []
+        self.value = (nan, nan, nan)
+        self.previous = (nan, nan, nan)
+
+    def step(self, close):
+        if self.count < self.slowperiod - 1:
+            return (nan, nan, nan), None
+
+        if self.count == self.slowperiod - 1:
+            # As TA-Lib does, both averages start on the same kline : the fast one is seeded with the last
+            # fastperiod values only
+            history = list(self.window) + [close]
+            fast_ema = sum(history[-self.fastperiod:]) / self.fastperiod
+            slow_ema = sum(history) / self.slowperiod
+            signal = None
+        else:
+            fast_ema, slow_ema, signal = self.state
+            fast_ema = ((close - fast_ema) * self.fast_k) + fast_ema
+            slow_ema = ((close - slow_ema) * self.slow_k) + slow_ema
+
+        macd = fast_ema - slow_ema
+        if signal is None:
+            seeding = len(self.macd_values) + 1
+            if seeding < self.signalperiod:
+                return (nan, nan, nan), (fast_ema, slow_ema, None)
+            signal = (sum(self.macd_values) + macd) / self.signalperiod
+        else:
+            signal = ((macd - signal) * self.signal_k) + signal
+
+        return (macd, signal, macd - signal), (fast_ema, slow_ema, signal)
+
+    def update(self, close):
+        value = super().update(close)
+        if self.state is not None and self.state[2] is None:
+            self.macd_values.append(self.state[0] - self.state[1])
+        elif self.macd_values:
+            self.macd_values = []
+        return value
+
+
+class SAR(StreamingIndicator):
+    inputs = ("high", "low")
+
+    def __init__(self, acceleration=0.02, maximum=0.2):
+        super().__init__(window=1)
+        self.acceleration = min(acceleration, maximum)
+        self.maximum = maximum
+
+    def step(self, high, low):
+        if self.count == 0:
+            return nan, None
+
+        if self.state is None:
+            # The first trend is given by the directional movement between the first two klines
+            first_high, first_low = self.window[-1]
+            minus_dm = first_low - low
+            is_long = not (minus_dm > 0 and high - first_high < minus_dm)
+            if is_long:
+                ep, sar = high, first_low
+            else:
+                ep, sar = low, first_high
+            prev_high, prev_low, af = high, low, self.acceleration
+        else:
+            is_long, sar, ep, af, prev_high, prev_low = self.state
+
+        acceleration = self.acceleration
+        if is_long:
+            if low <= sar:
+                # Switch to short, the SAR being the extreme point of the previous trend
+                is_long = False
+                sar = max(ep, prev_high, high)
+                value = sar
+                af, ep = acceleration, low
+                sar = max(sar + af * (ep - sar), prev_high, high)
+            else:
+                value = sar
+                if high > ep:
+                    ep = high
+                    af = min(af + acceleration, self.maximum)
+                sar = min(sar + af * (ep - sar), prev_low, low)
+        else:
+            if high >= sar:
+                # Switch to long
+                is_long = True
+                sar = min(ep, prev_low, low)
+                value = sar
+                af, ep = acceleration, high
+                sar = min(sar + af * (ep - sar), prev_low, low)
+            else:
+                value = sar
+                if low < ep:
+                    ep = low
+                    af = min(af + acceleration, self.maximum)
+                sar = max(sar + af * (ep - sar), prev_high, high)
+
+        return value, (is_long, sar, ep, af, high, low)
+
+
+class ATR(StreamingIndicator):
+    inputs = ("high", "low", "close")
+
+    def __init__(self, timeperiod=14):
+        super().__init__(window=1)
+        self.timeperiod = timeperiod
+        # Sum of the true ranges until the first value, then the previous ATR
+        self.state = 0.0
+
+    def step(self, high, low, close):
+        if self.count == 0:
+            return nan, self.state
+
+        previous_close = self.window[-1][2]
+        true_range = max(high - low, abs(previous_close - high), abs(previous_close - low))
+        if self.count < self.timeperiod:
+            return nan, self.state + true_range
+        if self.count == self.timeperiod:
+            value = (self.state + true_range) / self.timeperiod
+        else:
+            value = ((self.state * (self.timeperiod - 1)) + true_range) / self.timeperiod
+        return value, value
+
+
+class Ichimoku(StreamingIndicator):
+    # Tenkan-sen, kijun-sen, senkou span A and senkou span B of the last kline. The chikou span of the last klines
+    # being the close of klines to come, it is not given.
+    inputs = ("high", "low")
+
+    def __init__(self, tenkan_period=9, kijun_period=26, senkou_period=52, displacement=26):
+        super().__init__()
+        self.periods = (tenkan_period, kijun_period, senkou_period)
+        self.displacement = displacement
+        # Monotonic deques of (position, value) for each period, the first item being the extremum of the window
+        self.highs = {period: collections.deque() for period in self.periods}
+        self.lows = {period: collections.deque() for period in self.periods}
+        # Middle values of the last klines, the senkou spans being displaced forward
+        self.span_a = collections.deque(maxlen=displacement)
+        self.span_b = collections.deque(maxlen=displacement)
+        self.value = (nan, nan, nan, nan)
+        self.previous = (nan, nan, nan, nan)
+
+    def get_extremum(self, extrema, period, value, extremum):
+        if self.count < period - 1:
+            return nan
+        # Only the first item can leave the window when a kline comes in
+        if extrema and extrema[0][0] > self.count - period:
+            return extremum(extrema[0][1], value)
+        if len(extrema) > 1:
+            return extremum(extrema[1][1], value)
+        return value
+
+    def push_extremum(self, extrema, period, value, extremum):
+        # Values that can no longer be the extremum of a window are dropped
+        while extrema and extremum(extrema[-1][1], value) == value:
+            extrema.pop()
+        extrema.append((self.count, value))
+        if extrema[0][0] <= self.count - period:
+            extrema.popleft()
+
+    def get_middles(self, high, low):
+        return [(self.get_extremum(self.highs[period], period, high, max) + self.get_extremum(self.lows[period], period, low, min)) / 2
+                for period in self.periods]
+
+    def step(self, high, low):
+        tenkan_sen, kijun_sen, senkou_middle = self.get_middles(high, low)
+        middle_a = (tenkan_sen + kijun_sen) / 2
+        if not self.displacement:
+            return (tenkan_sen, kijun_sen, middle_a, senkou_middle), (middle_a, senkou_middle)
+
+        senkou_span_a = self.span_a[0] if len(self.span_a) == self.displacement else nan
+        senkou_span_b = self.span_b[0] if len(self.span_b) == self.displacement else nan
+        return (tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b), (middle_a, senkou_middle)
+
+    def update(self, high, low):
+        value, (middle_a, senkou_middle) = self.step(high, low)
+
+        for period in self.periods:
+            self.push_extremum(self.highs[period], period, high, max)
+            self.push_extremum(self.lows[period], period, low, min)
+        self.span_a.append(middle_a)
+        self.span_b.append(senkou_middle)
+
+        self.count += 1
+        self.previous = self.value
+        self.value = value
+        return value
+
+
+class KlineIndicators:
+    # Streaming indicators of one symbol and interval, fed with the klines closed since they were last read
+
+    indicator_classes = {"sma": SMA, "wma": WMA, "ema": EMA, "rsi": RSI, "macd": MACD, "sar": SAR, "atr": ATR,
+                         "ichimoku": Ichimoku}
+
+    def __init__(self, klines, interval=None):
+        self.klines = klines
+        self.interval = interval
+        self.indicators = {}
+        self.last_open_time = None
+
+    def get_indicator(self, name, **params):
+        self.update()
+        key = (name,) + tuple(sorted(params.items()))
+        if key not in self.indicators:
+            # A new indicator is seeded once with every closed kline available
+            closed_klines = self.klines.get_closed_klines(interval=self.interval)
+            if self.last_open_time is not None:
+                closed_klines = closed_klines.loc[closed_klines.index <= self.last_open_time]
+            self.indicators[key] = KlineIndicators.indicator_classes[name](**params).seed(closed_klines)
+        return self.indicators[key]
+
+    def update(self):
+        closed_klines = self.klines.get_closed_klines(after=self.last_open_time, interval=self.interval)
+        if closed_klines.empty:
+            return
+        self.last_open_time = closed_klines.index[-1]
+
+        for indicator in self.indicators.values():
+            columns = [closed_klines[name].values.tolist() for name in indicator.inputs]
+            for row in zip(*columns):
+                indicator.update(*row)
+
+    def get_last_values(self, name, **params):
+        # Values of the last two klines of get_kline_frame(interval), the last one possibly not closed yet
+        indicator = self.get_indicator(name, **params)
+        open_kline = self.klines.get_open_kline(self.interval)
+        if open_kline is None:
+            return indicator.previous, indicator.value
+        return indicator.value, indicator.peek(*[open_kline[name] for name in indicator.inputs])
+
+
+def main():
+    import talib
+    import Klines
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    kline_frame = Klines.Klines("BTCUSDT", "1h", limit=1000, futures=True).get_kline_frame()
+    seed_frame, new_klines = kline_frame.iloc[:500], kline_frame.iloc[500:]
+
+    sma = SMA(timeperiod=30).seed(seed_frame)
+    sar = SAR(acceleration=0.02, maximum=0.2).seed(seed_frame)
+    for open_time, kline in new_klines.iterrows():
+        sma.update(kline.close)
+        sar.update(kline.high, kline.low)
+
+    logger.debug("SMA : " + str(sma.value) + " / " + str(talib.SMA(kline_frame.close, timeperiod=30).iloc[-1]))
+    logger.debug("SAR : " + str(sar.value) + " / " + str(talib.SAR(kline_frame.high, kline_frame.low, 0.02, 0.2).iloc[-1]))
+
+    print("End of the <<StreamingIndicators>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
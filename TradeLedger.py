@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import os
+import time
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TradeLedger:
+    # Closed orders kept as fixed size records. Symbols are stored as their index in self.symbols.
+    # gain is net of the closing fees, as added to the balance, fees being the opening and closing ones.
+    record_dtype = np.dtype([("symbol", "<i4"), ("order_type", "i1"), ("open_time", "<i8"), ("close_time", "<i8"),
+                             ("entry_price", "<f8"), ("exit_price", "<f8"), ("quantity", "<f8"),
+                             ("take_profit", "<f8"), ("stop_loss", "<f8"), ("gain", "<f8"), ("fees", "<f8")])
+    initial_records = 64
+    # Records kept in memory before being appended to the spill file, when there is one
+    max_memory_records = 100000
+
+    def __init__(self, symbols=None, spill_path=None, max_memory_records=None):
+        self.symbols = list(symbols) if symbols else []
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.spill_path = spill_path
+        self.max_memory_records = max_memory_records if max_memory_records else TradeLedger.max_memory_records
+
+        self.records = np.zeros(TradeLedger.initial_records, dtype=TradeLedger.record_dtype)
+        self.size = 0
+        self.spilled = 0
+
+        # The spill file only holds the trades of this ledger, symbol indexes being those of self.symbols
+        if self.spill_path:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            open(self.spill_path, "wb").close()
+
+    def get_symbol_id(self, symbol):
+        if symbol not in self.symbol_index:
+            self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol_index[symbol]
+
+    def append(self, order, exit_price, gain, fees, close_time=None):
+        if self.size == len(self.records):
+            self.records = np.concatenate([self.records, np.zeros(len(self.records), dtype=TradeLedger.record_dtype)])
+
+        record = self.records[self.size:self.size + 1]
+        record["symbol"] = self.get_symbol_id(order.get_symbol())
+        record["order_type"] = order.get_order_type()
+        record["open_time"] = order.get_open_time()
+        record["close_time"] = close_time if close_time else int(time.time() * 1000)
+        record["entry_price"] = order.get_price()
+        record["exit_price"] = exit_price
+        record["quantity"] = order.get_quantity()
+        record["take_profit"] = order.get_take_profit()
+        record["stop_loss"] = order.get_stop_loss()
+        record["gain"] = gain
+        record["fees"] = fees
+        self.size += 1
+
+        if self.spill_path and self.size >= self.max_memory_records:
+            self.spill()
+
+    def spill(self):
+        with open(self.spill_path, "ab") as spill_file:
+            self.records[:self.size].tofile(spill_file)
+        self.spilled += self.size
+        logger.debug(str(self.size) + " trades appended to " + self.spill_path)
+        self.records = np.zeros(TradeLedger.initial_records, dtype=TradeLedger.record_dtype)
+        self.size = 0
+
+    def get_records(self):
+        # Every trade, the ones appended to the spill file being read through a memory map
+        if not self.spilled:
+            return self.records[:self.size]
+        spilled_records = np.memmap(self.spill_path, dtype=TradeLedger.record_dtype, mode="r", shape=(self.spilled,))
+        return np.concatenate([spilled_records, self.records[:self.size]])
+
+    def __len__(self):
+        return self.spilled + self.size
+
+    def get_symbol_summary(self):
+        # Per symbol gain, number of trades and fees, as arrays following self.symbols
+        records = self.get_records()
+        symbol_count = len(self.symbols)
+        return {"gain": np.bincount(records["symbol"], weights=records["gain"], minlength=symbol_count),
+                "trades": np.bincount(records["symbol"], minlength=symbol_count),
+                "fees": np.bincount(records["symbol"], weights=records["fees"], minlength=symbol_count)}
+
+    def get_symbol_gains(self):
+        return dict(zip(self.symbols, self.get_symbol_summary()["gain"].tolist()))
+
+    def get_total(self, field):
+        return float(self.get_records()[field].sum())
+
+    def to_str(self):
+        summary = self.get_symbol_summary()
+        buff_str = "{"
+        for i in np.flatnonzero(summary["trades"]):
+            buff_str += self.symbols[i] + ": " + str(summary["trades"][i]) + " trades, " + str(summary["gain"][i]) \
+                        + " gain, " + str(summary["fees"][i]) + " fees; "
+        return buff_str + "}"
+
+
+def main():
+    import Orders
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    trade_ledger = TradeLedger(["BTCUSDT", "ETHUSDT"], spill_path="./outputs/trades.bin", max_memory_records=1000)
+    for i in range(2500):
+        order = Orders.Orders(["BTCUSDT", "ETHUSDT"][i % 2], Orders.Orders.LONG, 100.0, 1.0)
+        trade_ledger.append(order, 100.0 + i % 7 - 3, i % 7 - 3, 0.08)
+    logger.debug(str(len(trade_ledger)) + " trades : " + trade_ledger.to_str())
+    os.remove("./outputs/trades.bin")
+
+    print("End of the <<TradeLedger>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,16 +19,21 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ###
 
+import ExchangeInfo
+
 import logging
 logger = logging.getLogger(__name__)
 
 
 class WalletManager:
 
-    def __init__(self):
+    def __init__(self, exchange_info=None):
         self.wallets = []
+        # Symbols of Binance, downloaded once and shared by every wallet
+        self.exchange_info = exchange_info if exchange_info else ExchangeInfo.ExchangeInfo.get_exchange_info()
 
     def add_wallet(self, wallet):
+        wallet.exchange_info = self.exchange_info
         self.wallets.append(wallet)
 
     def remove_wallet(self, wallet_ref=None, name=None):
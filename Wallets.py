@@ -19,11 +19,15 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ###
 
-import requests
 import datetime
+import numpy as np
 
 import Orders
 import BinanceAPI
+import ExchangeInfo
+import PositionBook
+import PriceService
+import TradeLedger
 
 import logging
 
@@ -34,30 +38,26 @@ logger = logging.getLogger(__name__)
 class Wallet:
     commission_fee_taker = 0.04
     commission_fee_maker = 0.02
-    spot_price_url = "https://api.binance.com/api/v3/ticker/price?symbol="
-    future_price_url = "https://fapi.binance.com/fapi/v1/ticker/price?symbol="
 
-    def __init__(self, name, wallet_dict, symbol_listing, base_symbol, futures=False, paper_trade=True):
+    def __init__(self, name, wallet_dict, symbol_listing, base_symbol, futures=False, paper_trade=True, ledger_path=None):
         self.name = name
         self.wallet = wallet_dict
         self.quantity = {}
-        self.symbol_gain = {}
         self.base_symbol = base_symbol
         self.futures = futures
         self.paper_trade = paper_trade
-        self.orders = []
-        self.active_long = []
-        self.active_short = []
+        # Active orders by symbol and order type, closed ones kept apart
+        self.position_book = PositionBook.PositionBook()
+        # Closed orders, appended to the file at ledger_path when given instead of all being kept in memory
+        self.trade_ledger = TradeLedger.TradeLedger(symbol_listing, spill_path=ledger_path)
+        # Shared by every wallet, WalletManager.add_wallet() giving its own
         self.exchange_info = Wallet.get_exchange_info()
 
         for symbol in symbol_listing:
             self.quantity[symbol] = 0.0
-            self.symbol_gain[symbol] = 0.0
 
-        if self.futures:
-            self.base_price_url = Wallet.future_price_url
-        else:
-            self.base_price_url = Wallet.spot_price_url
+        # Prices come from snapshots of every symbol shared by the wallets of the same market
+        self.price_service = PriceService.PriceService.get_service(self.futures)
 
     def get_value(self, symbol):
         return self.wallet[symbol]
@@ -72,38 +72,29 @@ class Wallet:
         return self.quantity[symbol]
 
     def get_actives(self):
-        return [i for i in self.orders if i.get_active()]
+        return self.position_book.get_actives()
 
-    def get_inactives(self):
-        return [i for i in self.orders if not i.get_active()]
+    def get_trade_records(self):
+        # Closed orders are no longer kept as Orders, they are the records of the TradeLedger
+        return self.trade_ledger.get_records()
 
     def get_order_by_symbol(self, symbol):
-        for order in self.orders:
-            if order.get_symbol() == symbol and order.get_active():
-                return order
-        return False
+        order = self.position_book.get_position(symbol)
+        return order if order else False
 
     def get_price(self, symbol="BTCUSDT"):
-        r_json = requests.get(self.base_price_url+symbol, timeout=10)
-        return float(r_json.json()['price'])
+        return self.price_service.get_price(symbol)
 
     @staticmethod
     def get_exchange_info():
-        r_json = requests.get("https://api.binance.com/api/v3/exchangeInfo", timeout=10)
-        return r_json.json()
+        return ExchangeInfo.ExchangeInfo.get_exchange_info()
 
     @staticmethod
     def get_spot_price(symbol="BTCUSDT"):
-        r_json = requests.get(Wallet.spot_price_url+symbol, timeout=10)
-        return float(r_json.json()['price'])
+        return PriceService.PriceService.get_service(futures=False).get_price(symbol)
 
     def get_prices(self):
-        price_dict = {}
-        for key, value in self.quantity.items():
-            price = self.get_price(key)
-            price_dict[key] = price
-
-        return price_dict
+        return self.price_service.get_prices(self.quantity)
 
     def add_to_balance(self, value):
         buf = self.wallet[self.base_symbol]
@@ -114,21 +105,10 @@ class Wallet:
         self.quantity[symbol] = buf + value
 
     def order_exist(self, symbol, order_type):
-        if order_type == 1:
-            for order in self.active_long:
-                if symbol == order.get_symbol():
-                    return order
-        elif order_type == 2:
-            for order in self.active_short:
-                if symbol == order.get_symbol():
-                    return order
-        return None
+        return self.position_book.get(symbol, order_type)
 
     def get_closed_profit(self):
-        total = 0.0
-        for i in self.symbol_gain:
-            total += self.symbol_gain[i]
-        return total
+        return self.trade_ledger.get_total("gain")
 
     def get_opened_profit(self):
         total = 0.0
@@ -150,30 +130,18 @@ class Wallet:
         return total
 
     def compute_usdt_ratio(self, symbol):
-        # Orders are based on quote_asset for buying / selling
-        # If it is different from USDT, using QUOTE/USDT pair is necessary to keep track of USD content in the wallet
-        usdt_ratio = 1
-        if symbol[-4:] != "USDT":
-            xchg_info = self.exchange_info
-
-            symbol_info = None
-            for row in xchg_info['symbols']:
-                if row['symbol'] == symbol:
-                    symbol_info = row
-
-            if symbol_info:
-                quote_usdt = symbol_info['quoteAsset'] + "USDT"
-                usdt_ratio = self.get_spot_price(quote_usdt)
-            else:
-                logger.error("Symbol : " + symbol + " not found in exchange_info(). Balance total may be incorrect !")
-                return -1
+        # Quote asset -> USDT ratios are cached by the exchange info for the current price snapshot
+        usdt_ratio = self.exchange_info.get_usdt_ratio(symbol)
+        if usdt_ratio is None:
+            logger.error("Symbol : " + symbol + " not found in exchange_info(). Balance total may be incorrect !")
+            return -1
 
         return usdt_ratio
 
-    def process_order_removal(self, symbol, close_order, remove_list, price, coeff):
+    def process_order_removal(self, symbol, close_order, price, coeff):
         logger.info("Order found for "+symbol+" - Closing it...")
         close_order.set_active(False)
-        remove_list.remove(close_order)
+        self.position_book.close(close_order)
         self.add_quantity(symbol, -close_order.get_quantity())
         usdt_ratio = self.compute_usdt_ratio(symbol)
 
@@ -184,7 +152,8 @@ class Wallet:
         closing_commission = ((close_order.get_quantity() * self.commission_fee_taker) * price * usdt_ratio) / 100
         return_invest = (price * close_order.get_quantity()) - (close_order.get_price() * close_order.get_quantity())
 
-        self.symbol_gain[symbol] += coeff * return_invest * usdt_ratio - closing_commission
+        self.trade_ledger.append(close_order, price, coeff * return_invest * usdt_ratio - closing_commission,
+                                 close_order.get_opening_fee() + closing_commission)
         add_balance = usdt_ratio * close_order.get_price() * close_order.get_quantity() + return_invest - closing_commission
         logger.info("Adding to balance : " + str(add_balance))
         self.add_to_balance(add_balance)
@@ -206,13 +175,7 @@ class Wallet:
             logger.info(self.get_name() + " - Short order rejected - Already short for " + symbol)
             return
 
-        if order_type == 1:
-            active_list = self.active_long
-            opposite_list = self.active_short
-        elif order_type == 2:
-            active_list = self.active_short
-            opposite_list = self.active_long
-        else:
+        if order_type not in [Orders.Orders.LONG, Orders.Orders.SHORT]:
             logger.info(self.get_name()+" - Incorrect order_type ("+order_type+")")
             return
 
@@ -227,7 +190,7 @@ class Wallet:
             coeff = None
 
         if close_order:
-            self.process_order_removal(symbol, close_order, opposite_list, price, coeff)
+            self.process_order_removal(symbol, close_order, price, coeff)
         else:
             usdt_ratio = self.compute_usdt_ratio(symbol)
 
@@ -242,28 +205,26 @@ class Wallet:
             quantity = real_order
 
         order = Orders.Orders(symbol, order_type, price, quantity, take_profit=take_profit, stop_loss=stop_loss, tpsl_percent=tpsl_percent)
-        active_list.append(order)
-        self.orders.append(order)
+        order.set_opening_fee(commission * usdt_ratio)
+        self.position_book.open(order)
         self.add_to_balance(-commission * usdt_ratio)
         self.add_quantity(symbol, quantity)
 
-    def exit_order(self, symbol):
-        price = self.get_price(symbol)
+    def exit_order(self, symbol, price=None):
+        price = price if price is not None else self.get_price(symbol)
         already_long = self.order_exist(symbol, 1)
         already_short = self.order_exist(symbol, 2)
 
         if already_short:
-            remove_list = self.active_short
             close_order = already_short
             coeff = -1
         elif already_long:
-            remove_list = self.active_long
             close_order = already_long
             coeff = 1
         else:
             return
 
-        self.process_order_removal(symbol, close_order, remove_list, price, coeff)
+        self.process_order_removal(symbol, close_order, price, coeff)
 
         return
 
@@ -273,28 +234,67 @@ class Wallet:
 
         return
 
-    def check_take_profit_stop_loss(self):
-        for order in self.active_long+self.active_short:
-            symbol = order.get_symbol()
-            price = self.get_price(symbol)
+    def exit_orders(self, symbols, prices):
+        # Orders triggered by the same check are closed together, at the prices they were triggered at
+        for symbol, price in zip(symbols, prices):
+            self.exit_order(symbol, price=price)
+
+    def check_take_profit_stop_loss(self, wicks=None):
+        # Every active order is checked at once against a single price snapshot. wicks is an optional dict of
+        # symbol -> (open times, highs, lows) of the klines since the previous check, so that wicks reaching a level
+        # are not missed, the order then being closed at that level. The stop loss wins when both levels were reached.
+        symbols, order_types, take_profits, stop_losses, open_times = self.position_book.get_levels()
+        if not len(symbols):
+            return []
+
+        prices = np.array(list(self.price_service.get_prices(symbols).values()))
+        high, low = prices, prices
+        if wicks:
+            wick_highs, wick_lows = self.get_wicks(wicks, symbols, open_times)
+            high, low = np.fmax(prices, wick_highs), np.fmin(prices, wick_lows)
+
+        long = order_types == Orders.Orders.LONG
+        stop_loss_hit = np.where(long, low <= stop_losses, high >= stop_losses)
+        take_profit_hit = np.where(long, high >= take_profits, low <= take_profits)
+        stop_loss_price = np.where(long, np.minimum(prices, stop_losses), np.maximum(prices, stop_losses))
+        take_profit_price = np.where(long, np.maximum(prices, take_profits), np.minimum(prices, take_profits))
+
+        triggered = np.flatnonzero(stop_loss_hit | take_profit_hit)
+        if len(triggered):
+            exit_prices = np.where(stop_loss_hit, stop_loss_price, take_profit_price)[triggered]
+            logger.info(self.get_name() + " - Take profit / stop loss reached for " + str(len(triggered)) + " orders")
+            self.exit_orders(symbols[triggered], exit_prices.tolist())
+        return list(symbols[triggered])
 
-            if (order.get_order_type() == 1 and (order.get_stop_loss() >= price or order.get_take_profit() <= price)) \
-                    or (order.get_order_type() == 2 and (order.get_stop_loss() <= price or order.get_take_profit() >= price)):
-                self.exit_order(symbol)
-        return
+    @staticmethod
+    def get_wicks(wicks, symbols, open_times):
+        # Highest and lowest prices of each order, only from the klines opened after the order as the wicks of the
+        # previous ones were reached before it existed
+        wick_highs = np.full(len(symbols), np.nan)
+        wick_lows = np.full(len(symbols), np.nan)
+        for index, (symbol, open_time) in enumerate(zip(symbols, open_times)):
+            if symbol not in wicks:
+                continue
+            kline_open_times, highs, lows = wicks[symbol]
+            after_open = kline_open_times >= open_time
+            if after_open.any():
+                wick_highs[index] = highs[after_open].max()
+                wick_lows[index] = lows[after_open].min()
+        return wick_highs, wick_lows
 
     def profit_to_str(self):
         buff_str = "{"
         latest_prices = self.get_prices()
+        symbol_gain = self.trade_ledger.get_symbol_gains()
         for key, value in self.quantity.items():
             exist_short = self.order_exist(key, 2)
             exist_long = self.order_exist(key, 1)
             if exist_long:
-                buff_str += key+": "+str(self.symbol_gain[key] + (latest_prices[exist_long.get_symbol()] * exist_long.get_quantity()) - (exist_long.get_price() * exist_long.get_quantity()))+", "
+                buff_str += key+": "+str(symbol_gain[key] + (latest_prices[exist_long.get_symbol()] * exist_long.get_quantity()) - (exist_long.get_price() * exist_long.get_quantity()))+", "
             elif exist_short:
-                buff_str += key+": "+str(self.symbol_gain[key] + (exist_short.get_price() * exist_short.get_quantity()) - (latest_prices[exist_short.get_symbol()] * exist_short.get_quantity()))+", "
+                buff_str += key+": "+str(symbol_gain[key] + (exist_short.get_price() * exist_short.get_quantity()) - (latest_prices[exist_short.get_symbol()] * exist_short.get_quantity()))+", "
             else:
-                buff_str += key+": "+str(self.symbol_gain[key])+", "
+                buff_str += key+": "+str(symbol_gain[key])+", "
 
         return buff_str+"}"
 
@@ -334,19 +334,20 @@ class Wallet:
 
     def overall_symbol_profit(self):
         latest_prices = self.get_prices()
+        symbol_gain = self.trade_ledger.get_symbol_gains()
         buff_str = "{"
         for key, value in self.quantity.items():
             exist_short = self.order_exist(key, 2)
             exist_long = self.order_exist(key, 1)
             if exist_long:
                 buff_str += key + ": " + str(
-                    self.symbol_gain[key] + (latest_prices[exist_long.get_symbol()] * exist_long.get_quantity()) - (
+                    symbol_gain[key] + (latest_prices[exist_long.get_symbol()] * exist_long.get_quantity()) - (
                                 exist_long.get_price() * exist_long.get_quantity())) + ", "
             elif exist_short:
-                buff_str += key + ": " + str(self.symbol_gain[key] + (exist_short.get_price() * exist_short.get_quantity()) - (
+                buff_str += key + ": " + str(symbol_gain[key] + (exist_short.get_price() * exist_short.get_quantity()) - (
                             latest_prices[exist_short.get_symbol()] * exist_short.get_quantity())) + ", "
             else:
-                buff_str += key + ": " + str(self.symbol_gain[key]) + ", "
+                buff_str += key + ": " + str(symbol_gain[key]) + ", "
 
         return buff_str + "}"
 
@@ -358,7 +359,7 @@ class Wallet:
         buff_str += "== Assets quantities"+'\n'
         buff_str += self.quantities_to_str()+'\n'
         buff_str += "== Closed order profits"+'\n'
-        buff_str += str(self.symbol_gain)+'\n'
+        buff_str += self.trade_ledger.to_str()+'\n'
         buff_str += "== Opened order profits"+'\n'
         buff_str += self.opened_symbol_profit()+'\n'
         buff_str += "== Cumulated profits"+'\n'
@@ -384,7 +385,7 @@ def main_spot():
 
     logger.debug(wallet_demo.get_name())
     logger.debug(wallet_demo.get_base_balance())
-    logger.debug(wallet_demo.get_inactives())
+    logger.debug(wallet_demo.get_trade_records())
     logger.debug(wallet_demo.get_actives())
     logger.debug(wallet_demo.get_value("USD"))
     logger.debug(wallet_demo.get_quantity(symbol_listing[0]))
@@ -418,7 +419,7 @@ def main():
 
     logger.debug(wallet_demo.get_name())
     logger.debug(wallet_demo.get_base_balance())
-    logger.debug(wallet_demo.get_inactives())
+    logger.debug(wallet_demo.get_trade_records())
     logger.debug(wallet_demo.get_actives())
     logger.debug(wallet_demo.get_value("USD"))
     logger.debug(wallet_demo.get_quantity(symbol_listing[0]))
@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import numpy as np
+import pandas as pd
+
+import indicators as ind
+import strategies as strat
+import Orders
+import Wallets
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Reasons for which a trade is closed
+EXIT_SIGNAL = "signal"
+EXIT_STOP_LOSS = "stop_loss"
+EXIT_OPEN = "open"
+EXIT_END = "end"
+
+
+def get_trade_starts(close, signal_index, sides, stop_offset):
+    # Orders follow Wallet.push_order() : a signal opens a position when there is none, closes and reverses the
+    # position on the opposite side, and is rejected when the position is already on its side. A position closed by
+    # the trailing stop is opened again by the next signal of the same side.
+    run_start = np.r_[True, sides[1:] != sides[:-1]]
+    signal_run = np.cumsum(run_start) - 1
+    starts = signal_index[run_start]
+
+    while True:
+        stops = get_stop_hits(close, starts, sides[np.searchsorted(signal_index, starts)], stop_offset)
+
+        # Positions stopped before the end of their run of signals start again at the next one
+        stopped = np.flatnonzero(stops >= 0)
+        next_signal = np.searchsorted(signal_index, stops[stopped])
+        valid = next_signal < len(signal_index)
+        next_signal, stopped = next_signal[valid], stopped[valid]
+        same_run = signal_run[next_signal] == signal_run[np.searchsorted(signal_index, starts[stopped])]
+        new_starts = np.setdiff1d(signal_index[next_signal[same_run]], starts)
+        if not len(new_starts):
+            return starts, stops
+        starts = np.union1d(starts, new_starts)
+
+
+def get_stop_hits(close, starts, start_sides, stop_offset):
+    # Kline at which each position is closed by the trailing stop, -1 if it is not. As with
+    # strategies.moving_atr_stop_loss(), the stop is set at each kline close and only moves in the direction of the
+    # position. It is checked from the next kline on, including the one opening the next position.
+    stops = np.full(len(starts), -1, dtype=np.int64)
+    if stop_offset is None or not len(starts):
+        return stops
+
+    candles = np.arange(starts[0], len(close))
+    position = np.searchsorted(starts, candles, side="right") - 1
+    side = start_sides[position]
+    # Short positions are handled as long ones by reversing the prices
+    trailing = pd.Series(side * close[candles] - stop_offset[candles]).groupby(position).cummax().values
+
+    hit = side[:-1] * close[candles[1:]] <= trailing[:-1]
+    hit_position, first_hit = np.unique(position[:-1][hit], return_index=True)
+    stops[hit_position] = candles[1:][hit][first_hit]
+    return stops
+
+
+def run_backtest(close, signal, amount=1000.0, stop_offset=None, fee_taker=Wallets.Wallet.commission_fee_taker, close_at_end=False):
+    # close and signal (1 long, -1 short, 0 nothing) are arrays of the same length, orders being executed at the close
+    # of the kline giving the signal. stop_offset is the distance of the trailing stop to the close, atr * multiplier.
+    # With close_at_end, the position still open at the end is closed at the last close instead of being kept open.
+    close = np.asarray(close, dtype=np.float64)
+    signal = np.asarray(signal)
+    length = len(close)
+    signal_index = np.flatnonzero(signal)
+    sides = signal[signal_index].astype(np.int64)
+    if stop_offset is not None:
+        stop_offset = np.asarray(stop_offset, dtype=np.float64)
+
+    if not len(signal_index):
+        trades = {name: np.empty(0) for name in ["entry", "exit", "side", "entry_price", "exit_price", "quantity",
+                                                 "gain", "fees"]}
+        trades["exit_reason"] = np.empty(0, dtype=object)
+        return trades, np.zeros(length)
+
+    starts, stops = get_trade_starts(close, signal_index, sides, stop_offset)
+    side = sides[np.searchsorted(signal_index, starts)]
+
+    # Without a stop, a position is closed by the next one or is still open at the end of the klines
+    next_start = np.r_[starts[1:], length]
+    stopped = stops >= 0
+    exits = np.where(stopped, stops, np.minimum(next_start, length - 1))
+    still_open = ~stopped & (next_start == length)
+    closed = ~still_open | close_at_end
+    exit_reason = np.where(stopped, EXIT_STOP_LOSS, np.where(still_open, EXIT_END if close_at_end else EXIT_OPEN, EXIT_SIGNAL)).astype(object)
+
+    entry_price = close[starts]
+    exit_price = close[exits]
+    quantity = amount / entry_price
+    gain = side * (exit_price - entry_price) * quantity
+    opening_fees = (quantity * fee_taker * entry_price) / 100
+    closing_fees = np.where(closed, (quantity * fee_taker * exit_price) / 100, 0.0)
+
+    # Equity : gains and fees of closed trades, plus the current gain of the open position
+    realized = np.zeros(length)
+    np.add.at(realized, starts, -opening_fees)
+    np.add.at(realized, exits[closed], gain[closed] - closing_fees[closed])
+    candles = np.arange(length)
+    trade = np.searchsorted(starts, candles, side="right") - 1
+    in_position = (trade >= 0) & (candles < np.where(closed, exits, length)[np.maximum(trade, 0)])
+    unrealized = np.zeros(length)
+    held = trade[in_position]
+    unrealized[in_position] = side[held] * (close[in_position] - entry_price[held]) * quantity[held]
+    equity = np.cumsum(realized) + unrealized
+
+    trades = {"entry": starts, "exit": exits, "side": side, "entry_price": entry_price, "exit_price": exit_price,
+              "quantity": quantity, "gain": gain, "fees": opening_fees + closing_fees, "exit_reason": exit_reason}
+    return trades, equity
+
+
+def get_stop_offset(kline_frame, atr_length=14, atr_multiplier=None):
+    # Distance of the ATR trailing stop to the close of each kline, None without atr_multiplier
+    if not atr_multiplier:
+        return None
+    return ind.get_atr(kline_frame.high, kline_frame.low, kline_frame.close, timeperiod=atr_length).values * atr_multiplier
+
+
+def backtest(kline_frame, signal, amount=1000.0, atr_length=14, atr_multiplier=None, fee_taker=Wallets.Wallet.commission_fee_taker):
+    # Returns the trades and the equity curve of the signal over kline_frame, with an ATR trailing stop when
+    # atr_multiplier is given
+    stop_offset = get_stop_offset(kline_frame, atr_length=atr_length, atr_multiplier=atr_multiplier)
+    trades, equity = run_backtest(kline_frame.close.values, signal, amount=amount, stop_offset=stop_offset, fee_taker=fee_taker)
+
+    open_times = kline_frame.index.values
+    trade_frame = pd.DataFrame({"entry_time": open_times[trades["entry"].astype(np.int64)],
+                                "exit_time": open_times[trades["exit"].astype(np.int64)],
+                                "order_type": np.where(trades["side"] == 1, Orders.Orders.LONG, Orders.Orders.SHORT),
+                                "entry_price": trades["entry_price"], "exit_price": trades["exit_price"],
+                                "quantity": trades["quantity"], "gain": trades["gain"], "fees": trades["fees"],
+                                "profit": trades["gain"] - trades["fees"], "exit_reason": trades["exit_reason"]})
+    return trade_frame, pd.Series(equity, index=kline_frame.index, name="equity")
+
+
+def get_summary(trade_frame, equity):
+    return get_trade_summary({"gain": trade_frame.gain.values, "fees": trade_frame.fees.values}, equity.values)
+
+
+def get_trade_summary(trades, equity):
+    # Same as get_summary() for the trades and equity arrays given by run_backtest()
+    drawdown = np.maximum.accumulate(np.r_[0.0, equity])[1:] - equity
+    profit = trades["gain"] - trades["fees"]
+    return {"profit": float(equity[-1]) if len(equity) else 0.0,
+            "fees": float(trades["fees"].sum()),
+            "trades": len(profit),
+            "win_rate": float((profit > 0).mean()) if len(profit) else 0.0,
+            "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0}
+
+
+def backtest_golden_cross(kline_frame, ma_type="wma", fast_ma=50, slow_ma=200, amount=1000.0, atr_length=14, atr_multiplier=None):
+    signal = strat.golden_cross_signal(kline_frame, ma_type=ma_type, fast_ma=fast_ma, slow_ma=slow_ma)
+    return backtest(kline_frame, signal, amount=amount, atr_length=atr_length, atr_multiplier=atr_multiplier)
+
+
+def backtest_sar_strategy(kline_frame, acceleration=0.02, maximum=0.2, amount=1000.0, atr_length=14, atr_multiplier=None):
+    signal = strat.sar_signal(kline_frame, acceleration=acceleration, maximum=maximum)
+    return backtest(kline_frame, signal, amount=amount, atr_length=atr_length, atr_multiplier=atr_multiplier)
+
+
+def main():
+    import Klines
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    start_time = Klines.Klines.timestamp_to_binance("2021-01-01 00:00:00,00")
+    end_time = Klines.Klines.timestamp_to_binance("2022-01-01 00:00:00,00")
+    kline_frame = Klines.Klines("BTCUSDT", "1m", start_time=start_time, end_time=end_time, futures=True, keep_last=True).get_kline_frame()
+
+    trade_frame, equity = backtest_golden_cross(kline_frame, ma_type="wma", fast_ma=50, slow_ma=200, atr_multiplier=1.2)
+    logger.debug(trade_frame.tail())
+    logger.debug("Golden cross : " + str(get_summary(trade_frame, equity)))
+
+    trade_frame, equity = backtest_sar_strategy(kline_frame, amount=2000.0)
+    logger.debug("SAR : " + str(get_summary(trade_frame, equity)))
+
+    print("End of the <<backtest>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
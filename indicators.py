@@ -20,11 +20,29 @@
 ###
 
 import talib
+import functools
+import numpy as np
 import pandas as pd
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+import IndicatorCache
+
 import logging
 logger = logging.getLogger(__name__)
 
 
+def cached(function):
+    # Indicators computed on klines of Klines.get_kline_frame() are shared by every caller until a kline changes
+    @functools.wraps(function)
+    def cached_function(*inputs, **params):
+        key = IndicatorCache.IndicatorCache.make_key(function.__name__, inputs, params)
+        if key is None:
+            return function(*inputs, **params)
+        return IndicatorCache.IndicatorCache.get_cache().get(key, lambda: function(*inputs, **params))
+    return cached_function
+
+
 def cross_up(penu_line1, line1, penu_line2, line2):
     if (penu_line1 < penu_line2) and (line1 > line2):
         return True
@@ -39,26 +57,101 @@ def cross_down(penu_line1, line1, penu_line2, line2):
         return False
 
 
+def cross_up_signal(line1, line2):
+    # True on each position where line1 crosses above line2, over the last axis of series or (symbols x time) panels
+    line1, line2 = np.broadcast_arrays(np.asarray(line1, dtype=np.float64), np.asarray(line2, dtype=np.float64))
+    signal = np.zeros(line1.shape, dtype=bool)
+    signal[..., 1:] = (line1[..., :-1] < line2[..., :-1]) & (line1[..., 1:] > line2[..., 1:])
+    return signal
+
+
+def cross_down_signal(line1, line2):
+    return cross_up_signal(line2, line1)
+
+
+def cross_signal(line1, line2):
+    # 1 where line1 crosses above line2, -1 where it crosses below and 0 elsewhere
+    return cross_up_signal(line1, line2).astype(np.int8) - cross_down_signal(line1, line2).astype(np.int8)
+
+
+def sar_flip_signal(high, low, sar):
+    # -1 where the SAR goes above the klines, 1 where it goes below them and 0 elsewhere
+    high, low, sar = (np.asarray(values, dtype=np.float64) for values in (high, low, sar))
+    signal = np.zeros(sar.shape, dtype=np.int8)
+    short = (sar[..., 1:] >= high[..., 1:]) & (sar[..., :-1] <= low[..., :-1])
+    long = (sar[..., 1:] <= low[..., 1:]) & (sar[..., :-1] >= high[..., :-1])
+    signal[..., 1:] = np.where(short, -1, np.where(long, 1, 0))
+    return signal
+
+
+@cached
 def get_macd(x, fastperiod=12, slowperiod=26, signalperiod=9):
     return talib.MACD(x, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
 
 
+@cached
 def get_rsi(x, timeperiod=60):
     return talib.RSI(x, timeperiod=timeperiod)
 
 
+@cached
 def get_sar(high, low, acceleration=0, maximum=0):
     return talib.SAR(high, low, acceleration=acceleration, maximum=maximum)
 
 
+@cached
 def get_sma(close, timeperiod=30):
     return talib.SMA(close, timeperiod=timeperiod)
 
 
+@cached
 def get_wma(close, timeperiod=30):
     return talib.WMA(close, timeperiod=timeperiod)
 
 
+@cached
+def get_atr(high, low, close, timeperiod=14):
+    return talib.ATR(high, low, close, timeperiod=timeperiod)
+
+
+# Indicators of (symbols x time) panels, as given by KlinePanel, computed for every symbol at once
+def get_panel_sma(close, timeperiod=30):
+    # Sums of the windows are differences of a cumulative sum, windows holding a missing kline being NaN
+    close = np.asarray(close, dtype=np.float64)
+    sma = np.full_like(close, np.nan)
+    if close.shape[-1] >= timeperiod:
+        missing = np.isnan(close)
+        zeros = np.zeros(close.shape[:-1] + (1,))
+        sums = np.concatenate([zeros, np.cumsum(np.where(missing, 0.0, close), axis=-1)], axis=-1)
+        missing_counts = np.concatenate([zeros, np.cumsum(missing, axis=-1)], axis=-1)
+        window_sums = sums[..., timeperiod:] - sums[..., :-timeperiod]
+        window_missing = missing_counts[..., timeperiod:] - missing_counts[..., :-timeperiod]
+        sma[..., timeperiod - 1:] = np.where(window_missing > 0, np.nan, window_sums / timeperiod)
+    return sma
+
+
+def get_panel_wma(close, timeperiod=30):
+    close = np.asarray(close, dtype=np.float64)
+    wma = np.full_like(close, np.nan)
+    if close.shape[-1] >= timeperiod:
+        weights = np.arange(1, timeperiod + 1, dtype=np.float64) / ((timeperiod * (timeperiod + 1)) >> 1)
+        wma[..., timeperiod - 1:] = sliding_window_view(close, timeperiod, axis=-1) @ weights
+    return wma
+
+
+def get_panel_sar(high, low, acceleration=0, maximum=0):
+    # The SAR depends on its previous value, TA-Lib is run once per symbol. It is only given the klines of the symbol,
+    # klines missing anywhere in its row staying NaN, as TA-Lib does not handle NaN after the first kline.
+    high = np.atleast_2d(np.asarray(high, dtype=np.float64))
+    low = np.atleast_2d(np.asarray(low, dtype=np.float64))
+    sar = np.full_like(high, np.nan)
+    for row in range(high.shape[0]):
+        present = np.isfinite(high[row]) & np.isfinite(low[row])
+        if present.sum() > 1:
+            sar[row, present] = talib.SAR(high[row, present], low[row, present], acceleration=acceleration, maximum=maximum)
+    return sar
+
+
 # Ichimoku Kinko Hyo
 def get_tenkan_sen(kline_frame):
     period9_high = kline_frame.high.rolling(window=9).max()
@@ -86,15 +179,59 @@ def get_chikou_span(kline_frame):
     return kline_frame.close.shift(-26)
 
 
-def ichimoku_cloud(kline_frame):
-    ichi_frame = pd.DataFrame()
-    ichi_frame['tenkan_sen'] = get_tenkan_sen(kline_frame)
-    ichi_frame['kijun_sen'] = get_kijun_sen(kline_frame)
-    ichi_frame['senkou_span_a'] = get_senkou_span_a(ichi_frame['tenkan_sen'], ichi_frame['kijun_sen'])
-    ichi_frame['senkou_span_b'] = get_senkou_span_b(kline_frame)
-    ichi_frame['chikou_span'] = get_chikou_span(kline_frame)
+def rolling_extrema(values, windows, extremum=np.maximum):
+    # Rolling max (or min with np.minimum) over the last axis for several windows at once, values being a series or
+    # a (symbols x time) panel. Each level of the sparse table holds the extremum of the 2^level values ending at
+    # each position, any window being covered by two overlapping blocks of the same level.
+    values = np.asarray(values, dtype=np.float64)
+    length = values.shape[-1]
+    levels = [values]
+    span = 1
+    while span * 2 <= max(windows):
+        level = np.full_like(values, np.nan)
+        level[..., span:] = extremum(levels[-1][..., span:], levels[-1][..., :-span])
+        levels.append(level)
+        span *= 2
+
+    extrema = {}
+    for window in windows:
+        level = window.bit_length() - 1
+        offset = window - (1 << level)
+        extrema[window] = np.full_like(values, np.nan)
+        if length >= window:
+            extrema[window][..., window - 1:] = extremum(levels[level][..., window - 1:], levels[level][..., (1 << level) - 1:length - offset])
+    return extrema
+
+
+def shift(values, periods):
+    # Same as pandas shift over the last axis
+    shifted = np.full_like(values, np.nan)
+    if periods >= 0:
+        shifted[..., periods:] = values[..., :values.shape[-1] - periods]
+    else:
+        shifted[..., :periods] = values[..., -periods:]
+    return shifted
+
 
-    return ichi_frame
+def ichimoku_panel(high, low, close, tenkan_period=9, kijun_period=26, senkou_period=52, displacement=26):
+    # high, low and close are series or (symbols x time) panels, every line being computed for all of them at once
+    windows = (tenkan_period, kijun_period, senkou_period)
+    highs = rolling_extrema(high, windows, np.maximum)
+    lows = rolling_extrema(low, windows, np.minimum)
+
+    tenkan_sen = (highs[tenkan_period] + lows[tenkan_period]) / 2
+    kijun_sen = (highs[kijun_period] + lows[kijun_period]) / 2
+    return {"tenkan_sen": tenkan_sen,
+            "kijun_sen": kijun_sen,
+            "senkou_span_a": shift((tenkan_sen + kijun_sen) / 2, displacement),
+            "senkou_span_b": shift((highs[senkou_period] + lows[senkou_period]) / 2, displacement),
+            "chikou_span": shift(np.asarray(close, dtype=np.float64), -displacement)}
+
+
+@cached
+def ichimoku_cloud(kline_frame):
+    ichi_lines = ichimoku_panel(kline_frame.high.values, kline_frame.low.values, kline_frame.close.values)
+    return pd.DataFrame(ichi_lines, index=kline_frame.index)
 
 
 def main():
@@ -107,6 +244,13 @@ def main():
     ichi_cloud = ichimoku_cloud(kline_frame.get_kline_frame())
     logger.debug(ichi_cloud.head())
 
+    # Ichimoku lines of several symbols computed at once on (symbols x time) panels
+    kline_frames = [Klines.Klines(symbol, "1h", futures=True, keep_last=True).get_kline_frame() for symbol in ["BTCUSDT", "ETHUSDT"]]
+    ichi_lines = ichimoku_panel(np.vstack([frame.high.values for frame in kline_frames]),
+                                np.vstack([frame.low.values for frame in kline_frames]),
+                                np.vstack([frame.close.values for frame in kline_frames]))
+    logger.debug(ichi_lines["kijun_sen"][:, -5:])
+
     print("End of the <<indicator>> tests.\n")
 
 
@@ -22,29 +22,63 @@
 import sys
 import csv
 import time
+import queue
 import datetime
 
 from argparse import ArgumentParser
 
 import Klines
+import KlineSet
+import KlineStore
+import KlineStream
 import Wallets
 import WalletManager
+import PriceService
+import StrategyRegistry
+import StrategyWorkers
 import statistics
-import strategies as strat
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def apply_order_intents(intents, wallets):
+    # Intents given by the StrategyRegistry are pushed to the wallet of their timeframe
+    for intent in intents:
+        logger.debug(intent["strategy"] + " on " + intent["timeframe"] + " : order for " + intent["symbol"])
+        wallets[intent["timeframe"]].push_order(intent["symbol"], intent["order_type"], intent["amount"])
+
+
+def get_wicks(wick_klines, since):
+    # Open times, highs and lows of the 1m klines of each symbol since the given time, wallets keeping for each order
+    # only the klines opened after it
+    wick_klines.update_all()
+    wicks = {}
+    for symbol in wick_klines.get_symbols():
+        kline_frame = wick_klines.get_kline_frame(symbol)
+        klines = kline_frame.loc[kline_frame.close_time >= since]
+        if not klines.empty:
+            wicks[symbol] = (klines.index.values, klines.high.values, klines.low.values)
+    return wicks
+
+
+def check_take_profit_stop_loss(wallets, wick_klines=None, since=None):
+    # Returns the time of this check, to be given as since to the next one
+    check_time = Klines.Klines.now_to_binance()
+    wicks = get_wicks(wick_klines, since) if wick_klines else None
+    for wallet in wallets:
+        wallet.check_take_profit_stop_loss(wicks=wicks)
+    return check_time
+
+
 def main():
     print("python_trading_bot  Copyright (C) 2021  Olivier DECOURBE \n\
     This program comes with ABSOLUTELY NO WARRANTY. \n\
     This is free software, and you are welcome to redistribute it \n\
     under certain conditions; type `python3 main.py --warranty' or `python3 main.py -w` for details.")
 
-    timeframe_to_sec = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "2h": 7200, "4h": 14400,
-                        "6h": 21600, "8h": 28800, "12h": 43200, "1d": 86400, "3d": 259200, "1w": 604800, "1M": 2419200}
+    timeframe_to_sec = Klines.Klines.timeframe_to_sec
 
     now = datetime.datetime.now()
     logging.basicConfig(filename="./outputs/logs/trading_bot_" + now.strftime("%Y%m%d_%H%M%S") + ".log",
@@ -54,12 +88,28 @@ def main():
 
     parser = ArgumentParser()
     parser.add_argument("-t", "--timeframe", dest="timeframe", default="15m", help="The chosen timeframe as given on "
-                                                                                   "binance (1m, 3m, 1h,...).")
+                                                                                   "binance (1m, 3m, 1h,...). Several "
+                                                                                   "comma separated timeframes can be "
+                                                                                   "given (1m,15m,1h).")
     parser.add_argument("-u", "--runUntil", type=datetime.datetime.fromisoformat, dest="stop_date",
                         default=datetime.datetime.now() + datetime.timedelta(days=1),
                         help="Date at which the script stops. Formatted as YYYY-MM-DD.HH:mm:ss")
     parser.add_argument("-s", "--symbols", dest="symbol_file", default="./symbol_list.csv",
                         help="Path to the .csv that contains symbols")
+    parser.add_argument("-d", "--dataStore", dest="data_store", default="./data/klines",
+                        help="Folder where klines are stored between runs")
+    parser.add_argument("-c", "--config", dest="strategy_config", default="./strategies.json",
+                        help="Path to the .json that lists the strategies to run and their parameters")
+    parser.add_argument("-p", "--processes", dest="processes", type=int, default=1,
+                        help="Number of processes sharing the symbols to update klines and run strategies on. Only used "
+                             "when polling the REST API.")
+    parser.add_argument("-r", "--priceTtl", dest="price_ttl", type=float, default=PriceService.PriceService.ttl,
+                        help="Seconds during which wallets share the same snapshot of prices.")
+    parser.add_argument("-k", "--checkWicks", dest="check_wicks", nargs='?', const=True, default=False,
+                        help="Check take profit / stop loss against the highs and lows of 1m klines, not only the "
+                             "price at the time of the check.")
+    parser.add_argument("-l", "--liveStream", dest="live_stream", nargs='?', const=True, default=False,
+                        help="Receive klines from Binance websocket streams instead of polling the REST API.")
     parser.add_argument("-w", "--warranty", dest="license_info", nargs='?', const=True, default=False,
                         help="Display licencing extended information.")
     args = parser.parse_args()
@@ -69,55 +119,119 @@ def main():
             print(gplv3license.read())
         sys.exit("End Of license terms.")
 
-    kline_dict = {}
-
     with open(args.symbol_file) as symbol_file:
         reader = csv.reader(symbol_file)
         symbols_raw = list(reader)[0]
         symbols = [i.upper() for i in symbols_raw]
 
+    # Strategies without a timeframe in the configuration are run on every timeframe given
+    strategy_timeframes = args.timeframe.split(",")
+    registry = StrategyRegistry.StrategyRegistry.load(args.strategy_config, strategy_timeframes)
+
+    # Only the smallest timeframe is downloaded, the others are built from it
+    timeframes = sorted(set(strategy_timeframes + registry.get_timeframes()), key=lambda timeframe: timeframe_to_sec[timeframe])
+    base_timeframe = timeframes[0]
+
     # Interval at which stop_loss will be checked
     stop_loss_interval = timeframe_to_sec["1m"]
 
+    # Klines already downloaded by previous runs are loaded from disk
+    kline_store = KlineStore.KlineStore(args.data_store)
+
     # Defining a wallet manager that will track the different wallets
     wallet_manager = WalletManager.WalletManager()
 
-    # Retrieving history of klines for each symbol to track
-    for symbol in symbols:
-        logger.debug("Fetching " + symbol)
-        kline_dict[symbol] = Klines.Klines(symbol, args.timeframe, futures=False, keep_last=True, heikinashi=True)
-        kline_dict[symbol].update_klines()
-
-    # Creating a wallet that will handle orders and keep track of profit and loss
-    paper_wallet = Wallets.Wallet("paper_wallet" + args.timeframe, {"USD": 0.0}, symbols, "USD", futures=True)
-    wallet_manager.add_wallet(paper_wallet)
+    # Retrieving history of klines for each symbol to track, all symbols being fetched concurrently
+    logger.debug("Fetching " + str(len(symbols)) + " symbols")
+    strategy_workers = None
+    if args.processes > 1 and not args.live_stream:
+        # Klines are kept by the worker processes, which only send back order intents
+        strategy_workers = StrategyWorkers.StrategyWorkers(symbols, base_timeframe, timeframes, args.strategy_config,
+                                                           strategy_timeframes, processes=args.processes,
+                                                           store_directory=args.data_store, futures=False,
+                                                           keep_last=True, capacity=Klines.Klines.max_klines)
+    else:
+        kline_set = KlineSet.KlineSet(symbols, base_timeframe, futures=False, keep_last=True, store=kline_store,
+                                      capacity=Klines.Klines.max_klines)
+        for timeframe in timeframes[1:]:
+            kline_set.add_interval(timeframe)
+
+    # Prices of every symbol are fetched at once and shared by all wallets for price_ttl seconds
+    PriceService.PriceService.ttl = args.price_ttl
+
+    # Creating a wallet per timeframe that will handle orders and keep track of profit and loss, closed orders being
+    # appended to a file of the run instead of all being kept in memory
+    paper_wallets = {}
+    for timeframe in timeframes:
+        ledger_path = "./outputs/ledgers/paper_wallet" + timeframe + "_" + now.strftime("%Y%m%d_%H%M%S") + ".bin"
+        paper_wallets[timeframe] = Wallets.Wallet("paper_wallet" + timeframe, {"USD": 0.0}, symbols, "USD", futures=True,
+                                                  ledger_path=ledger_path)
+        wallet_manager.add_wallet(paper_wallets[timeframe])
+
+    wick_klines = None
+    last_check_time = Klines.Klines.now_to_binance()
+    if args.check_wicks:
+        # Wicks reached between two checks of take profit / stop loss are read from 1m klines
+        wick_klines = KlineSet.KlineSet(symbols, "1m", futures=False, keep_last=True, limit=60, capacity=Klines.Klines.max_klines)
+
+    if args.live_stream:
+        # Klines are updated by the stream thread, which queues the symbols whose candle just closed
+        closed_candles = queue.Queue()
+        kline_stream = KlineStream.KlineStream(kline_set)
+        kline_stream.subscribe(lambda klines: closed_candles.put(klines.symbol))
+        kline_stream.start()
+        next_check = time.time() + stop_loss_interval
 
     logger.debug("Starting trading bot core loop")
 
     # Main loop that will check strategies and update klines
     while datetime.datetime.now() < args.stop_date:
-        # Updating klines for each symbols
-        for symbol in symbols:
-            logger.debug("Processing " + symbol)
-            kline_dict[symbol].update_klines()
-
-            # Applying strategeis
-            strat.sar_strategy(symbol, kline_dict[symbol].get_kline_frame(), paper_wallet, amount=2000.0)
-            strat.golden_cross(symbol, kline_dict[symbol].get_kline_frame(), paper_wallet, ma_type="sma", fast_ma=2, slow_ma=5, amount=1000.0)
-
-        time_delta = timeframe_to_sec[args.timeframe] - (
-                    int(datetime.datetime.now().strftime('%s')) % timeframe_to_sec[args.timeframe])
-
-        print(paper_wallet.to_str())
+        if args.live_stream:
+            # Klines would not be updated anymore, the bot is stopped instead of waiting for candles forever
+            if not kline_stream.is_alive():
+                sys.exit("Exiting because the kline stream stopped, see the log for its error")
+            # Strategies are applied as soon as a candle closes, take profit / stop loss being checked in between
+            try:
+                symbol = closed_candles.get(timeout=max(0.0, next_check - time.time()))
+                apply_order_intents(registry.run_cycle(kline_set, [symbol]), paper_wallets)
+            except queue.Empty:
+                for paper_wallet in paper_wallets.values():
+                    print(paper_wallet.to_str())
+                last_check_time = check_take_profit_stop_loss(paper_wallets.values(), wick_klines, last_check_time)
+                next_check += stop_loss_interval
+            continue
+
+        if strategy_workers:
+            # Workers update their klines and apply strategies, intents being pushed here in a deterministic order
+            apply_order_intents(strategy_workers.run_cycle(), paper_wallets)
+            logger.debug(strategy_workers.to_str())
+        else:
+            # Updating klines for all symbols at once
+            kline_set.update_all()
+
+            # Applying strategeis at once to all symbols having a new closed kline, the registry skipping the others
+            apply_order_intents(registry.run_cycle(kline_set), paper_wallets)
+            logger.debug(registry.to_str())
+
+        time_delta = timeframe_to_sec[base_timeframe] - (
+                    int(datetime.datetime.now().strftime('%s')) % timeframe_to_sec[base_timeframe])
+
+        for paper_wallet in paper_wallets.values():
+            print(paper_wallet.to_str())
         # Take profit / Stop loss loop running until the next update
         while time_delta > stop_loss_interval:
-            paper_wallet.check_take_profit_stop_loss()
+            last_check_time = check_take_profit_stop_loss(paper_wallets.values(), wick_klines, last_check_time)
             time_delta -= stop_loss_interval
             time.sleep(stop_loss_interval)
 
         # Assuming computation overhead will enforce the new kline has been opened
         time.sleep(time_delta)
 
+    if args.live_stream:
+        kline_stream.stop()
+    if strategy_workers:
+        strategy_workers.close()
+
     logger.info("Waiting for the next candle to open.")
 
 
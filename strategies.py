@@ -19,9 +19,6 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ###
 
-import pandas as pd
-import talib
-
 import indicators as ind
 import Orders
 
@@ -29,83 +26,114 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def golden_cross(symbol, klines, wallet, ma_type="wma", fast_ma=50, slow_ma=200, amount=1000.0):
-    if ma_type == "wma":
+# Order type to push for each value of a signal
+signal_order_types = {1: Orders.Orders.LONG, -1: Orders.Orders.SHORT}
+
+
+def golden_cross_signal(klines, ma_type="wma", fast_ma=50, slow_ma=200, indicators=None):
+    # Signal of every kline, or of the last two klines only with the StreamingIndicators.KlineIndicators of klines
+    if indicators:
+        ma_name = "wma" if ma_type == "wma" else "sma"
+        ma_50 = indicators.get_last_values(ma_name, timeperiod=fast_ma)
+        ma_200 = indicators.get_last_values(ma_name, timeperiod=slow_ma)
+    elif ma_type == "wma":
         ma_50 = ind.get_wma(klines.close, timeperiod=fast_ma)
         ma_200 = ind.get_wma(klines.close, timeperiod=slow_ma)
     else:
         ma_50 = ind.get_sma(klines.close, timeperiod=fast_ma)
         ma_200 = ind.get_sma(klines.close, timeperiod=slow_ma)
 
-    if ind.cross_up(ma_50.iloc[-2], ma_50.iloc[-1], ma_200.iloc[-2], ma_200.iloc[-1]):
+    return ind.cross_signal(ma_50, ma_200)
+
+
+def golden_cross(symbol, klines, wallet, ma_type="wma", fast_ma=50, slow_ma=200, amount=1000.0, indicators=None):
+    signal = golden_cross_signal(klines, ma_type=ma_type, fast_ma=fast_ma, slow_ma=slow_ma, indicators=indicators)[-1]
+
+    if signal == 1:
         logger.debug("Cross-up happened !")
-        wallet.push_order(symbol, Orders.Orders.LONG, amount)
-    elif ind.cross_down(ma_50.iloc[-2], ma_50.iloc[-1], ma_200.iloc[-2], ma_200.iloc[-1]):
+    elif signal == -1:
         logger.debug("Cross-down happened !")
-        wallet.push_order(symbol, Orders.Orders.SHORT, amount)
+    if signal:
+        wallet.push_order(symbol, signal_order_types[signal], amount)
 
     return
 
 
-def sar_strategy(symbol, klines, wallet, amount=1000.0):
-    sar = ind.get_sar(klines.high, klines.low, acceleration=0.02, maximum=0.2)
+def sar_signal(klines, acceleration=0.02, maximum=0.2, indicators=None):
+    if indicators:
+        sar = indicators.get_last_values("sar", acceleration=acceleration, maximum=maximum)
+        return ind.sar_flip_signal(klines.high.values[-2:], klines.low.values[-2:], sar)
 
-    if sar.iloc[-1] >= klines.high.iloc[-1] and sar.iloc[-2] <= klines.low.iloc[-2]:
-        wallet.push_order(symbol, Orders.Orders.SHORT, amount)
-    elif sar.iloc[-1] <= klines.low.iloc[-1] and sar.iloc[-2] >= klines.high.iloc[-2]:
-        wallet.push_order(symbol, Orders.Orders.LONG, amount)
+    sar = ind.get_sar(klines.high, klines.low, acceleration=acceleration, maximum=maximum)
+    return ind.sar_flip_signal(klines.high, klines.low, sar)
+
+
+def sar_strategy(symbol, klines, wallet, amount=1000.0, indicators=None):
+    signal = sar_signal(klines, acceleration=0.02, maximum=0.2, indicators=indicators)[-1]
+
+    if signal:
+        wallet.push_order(symbol, signal_order_types[signal], amount)
 
     return
 
 
-def moving_atr_stop_loss(kline_frame, order, current_price, atr_length=14, atr_multiplier=1.2):
-    atr = (talib.ATR(kline_frame.high, kline_frame.low, kline_frame.close, timeperiod=atr_length).iloc[-1] * atr_multiplier)
+# Strategies as declared to the StrategyRegistry : the indicators they need, named after their parameters, and their
+# signal computed from these indicators over the candles of a KlinePanel
+def golden_cross_inputs(ma_type="wma", fast_ma=50, slow_ma=200):
+    ma_name = "wma" if ma_type == "wma" else "sma"
+    return {"fast_ma": (ma_name, {"timeperiod": fast_ma}), "slow_ma": (ma_name, {"timeperiod": slow_ma})}
+
+
+def golden_cross_inputs_signal(candles, inputs, **params):
+    return ind.cross_signal(inputs["fast_ma"], inputs["slow_ma"])
+
+
+def sar_strategy_inputs(acceleration=0.02, maximum=0.2):
+    return {"sar": ("sar", {"acceleration": acceleration, "maximum": maximum})}
+
+
+def sar_strategy_inputs_signal(candles, inputs, **params):
+    return ind.sar_flip_signal(candles.high, candles.low, inputs["sar"])
+
+
+def moving_atr_stop_loss(kline_frame, order, current_price, atr_length=14, atr_multiplier=1.2, indicators=None):
+    if indicators:
+        atr = indicators.get_last_values("atr", timeperiod=atr_length)[1] * atr_multiplier
+    else:
+        atr = (ind.get_atr(kline_frame.high, kline_frame.low, kline_frame.close, timeperiod=atr_length).iloc[-1] * atr_multiplier)
 
     if order.get_order_type() == Orders.Orders.LONG:
         new_stop_loss = current_price - atr
         if not order.stop_loss or new_stop_loss > order.stop_loss:
-            order.stop_loss = new_stop_loss
+            order.set_stop_loss(new_stop_loss)
     elif order.get_order_type() == Orders.Orders.SHORT:
         new_stop_loss = current_price + atr
         if not order.stop_loss or new_stop_loss < order.stop_loss:
-            order.stop_loss = new_stop_loss
+            order.set_stop_loss(new_stop_loss)
 
     return
 
 
 def main():
     import Klines as Kl
-    import Wallets
+    import backtest
 
     logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
                         format="%(asctime)s [%(name)s] : %(message)s")
 
     symbol = "LINKUSDT"
     interval = "1h"
-    start_time = int(Kl.Klines.timestamp_to_binance("2021-05-07 01:00:00,00"))
     end_time = int(Kl.Klines.timestamp_to_binance("2021-05-08 09:00:00,00"))
     historic_data = Kl.Klines(symbol, interval, limit=300,  end_time=end_time, futures=True, keep_last=True).get_kline_frame()
-    data = Kl.Klines(symbol, interval, start_time=start_time,  end_time=end_time, futures=True, keep_last=True).get_kline_frame()
-
-    replay_buffer = pd.DataFrame()
-    replay_buffer = replay_buffer.append(data.iloc[0])
-    replay_buffer = replay_buffer.append(data.iloc[1])
-
-    wallet = Wallets.Wallet("strategy_testing", {"USD": 0.0}, [symbol], "USD", True)
-
-    for i in range(data.shape[0] - 2):
-        sar_strategy(symbol, replay_buffer, wallet, 2000.0)
-        golden_cross(symbol, historic_data.loc[:replay_buffer.index.max()], wallet, ma_type="wma")
-
-        order = wallet.get_order_by_symbol(symbol)
-        current_price = replay_buffer.open.iloc[-1]
 
-        if order:
-            moving_atr_stop_loss(historic_data.loc[:replay_buffer.index.max()], order, current_price, atr_length=14, atr_multiplier=1.2)
+    # Signals of the whole history are replayed at once by the backtest module
+    trade_frame, equity = backtest.backtest(historic_data, sar_signal(historic_data), amount=2000.0, atr_length=14, atr_multiplier=1.2)
+    logger.debug(symbol + " sar_strategy : " + str(backtest.get_summary(trade_frame, equity)))
 
-        replay_buffer = replay_buffer.append(data.iloc[i+2])
+    trade_frame, equity = backtest.backtest(historic_data, golden_cross_signal(historic_data, ma_type="wma"), atr_length=14, atr_multiplier=1.2)
+    logger.debug(symbol + " golden_cross : " + str(backtest.get_summary(trade_frame, equity)))
 
-    logger.debug("End of the <Statistics> tests.\n")
+    logger.debug("End of the <Strategies> tests.\n")
 
 
 if __name__ == '__main__':
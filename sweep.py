@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import os
+import math
+import itertools
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import backtest
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Backtest function of each strategy, called with the parameters of the grid
+strategy_backtests = {"golden_cross": backtest.backtest_golden_cross, "sar_strategy": backtest.backtest_sar_strategy}
+# Kline columns copied to shared memory, the first row of each block being the open times
+shared_column_names = ["high", "low", "close"]
+# Columns of the results given by backtest.get_summary(), the other ones being parameters
+summary_names = ["profit", "fees", "trades", "win_rate", "max_drawdown"]
+
+# Klines of the worker processes, read from the shared memory blocks created by run_sweep()
+worker_klines = {}
+worker_blocks = []
+
+
+def get_combinations(grid):
+    # grid is a dict of parameter -> list of values, every combination being returned as a dict
+    names = list(grid)
+    combinations = [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+    # Moving averages whose fast period is not below the slow one never cross the way the strategy expects
+    return [params for params in combinations if params.get("fast_ma", 0) < params.get("slow_ma", math.inf)]
+
+
+def share_klines(kline_frames):
+    # Each symbol gets one shared block of shape (1 + columns, klines) holding the open times and the columns
+    blocks = []
+    layouts = {}
+    for symbol, kline_frame in kline_frames.items():
+        shape = (len(shared_column_names) + 1, len(kline_frame))
+        block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 8))
+        array = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        array[0] = kline_frame.index.values
+        for row, name in enumerate(shared_column_names, start=1):
+            array[row] = kline_frame[name].values
+        blocks.append(block)
+        layouts[symbol] = (block.name, shape)
+    return blocks, layouts
+
+
+def attach_klines(layouts, interval):
+    # Worker initializer : frames are built over the shared memory, nothing is copied
+    for symbol, (name, shape) in layouts.items():
+        block = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        columns = {column: array[row] for row, column in enumerate(shared_column_names, start=1)}
+        kline_frame = pd.DataFrame(columns, index=pd.Index(array[0].astype(np.int64), name="open_time"), copy=False)
+        # Indicators are then shared by the combinations of a worker through the IndicatorCache
+        kline_frame.attrs["symbol"] = symbol
+        kline_frame.attrs["interval"] = interval
+        worker_blocks.append(block)
+        worker_klines[symbol] = kline_frame
+
+
+def run_combination(task):
+    symbol, strategy, params = task
+    trade_frame, equity = strategy_backtests[strategy](worker_klines[symbol], **params)
+    result = {"symbol": symbol, "strategy": strategy}
+    result.update(params)
+    result.update(backtest.get_summary(trade_frame, equity))
+    return result
+
+
+def map_shared(kline_frames, function, tasks, processes=None, interval=None):
+    # Calls function on every task in worker processes reading kline_frames from shared memory (worker_klines)
+    processes = processes if processes else os.cpu_count()
+    blocks, layouts = share_klines(kline_frames)
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=attach_klines, initargs=(layouts, interval)) as executor:
+            chunksize = max(1, len(tasks) // (processes * 4))
+            return list(executor.map(function, tasks, chunksize=chunksize))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def run_sweep(kline_frames, strategy, grid, processes=None, interval=None):
+    # Backtests every combination of grid on every symbol of kline_frames (dict of symbol -> kline frame)
+    combinations = get_combinations(grid)
+    tasks = [(symbol, strategy, params) for params in combinations for symbol in kline_frames]
+    logger.info("Sweeping " + str(len(combinations)) + " combinations of " + strategy + " over " + str(len(kline_frames))
+                + " symbols with " + str(processes if processes else os.cpu_count()) + " processes")
+
+    return pd.DataFrame(map_shared(kline_frames, run_combination, tasks, processes=processes, interval=interval))
+
+
+def rank_results(results, by="profit"):
+    # One row per combination of parameters, summed over the symbols and sorted from the best one
+    param_names = [name for name in results.columns if name not in ["symbol"] + summary_names]
+    ranking = results.groupby(param_names, sort=False, dropna=False).agg(profit=("profit", "sum"), fees=("fees", "sum"),
+                                                                         trades=("trades", "sum"),
+                                                                         win_rate=("win_rate", "mean"),
+                                                                         max_drawdown=("max_drawdown", "max"))
+    return ranking.sort_values(by, ascending=False).reset_index()
+
+
+def main():
+    import time
+    import Klines
+    import KlineSet
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT"]
+    start_time = Klines.Klines.timestamp_to_binance("2021-01-01 00:00:00,00")
+    end_time = Klines.Klines.timestamp_to_binance("2021-07-01 00:00:00,00")
+    kline_set = KlineSet.KlineSet(symbols, "15m", start_time=start_time, end_time=end_time, futures=True, keep_last=True)
+    kline_frames = {symbol: kline_set.get_kline_frame(symbol) for symbol in symbols}
+
+    grid = {"ma_type": ["sma", "wma"], "fast_ma": [5, 10, 20, 50], "slow_ma": [50, 100, 200],
+            "atr_length": [14], "atr_multiplier": [None, 1.2, 2.0, 3.0]}
+    start = time.time()
+    results = run_sweep(kline_frames, "golden_cross", grid, interval="15m")
+    logger.debug("Sweep done in " + str(time.time() - start) + "s")
+    logger.debug("\n" + rank_results(results).head(10).to_string())
+
+    grid = {"acceleration": [0.01, 0.02, 0.04], "maximum": [0.1, 0.2, 0.4], "atr_multiplier": [None, 1.2, 2.0]}
+    logger.debug("\n" + rank_results(run_sweep(kline_frames, "sar_strategy", grid, interval="15m")).head(10).to_string())
+
+    kline_set.close()
+    print("End of the <<sweep>> test phase.")
+
+
+if __name__ == '__main__':
+    main()
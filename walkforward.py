@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+###
+# Part of python crypto trading bot available here : https://github.com/yzgastk/python_crypto_trading_bot
+# Copyright (C) 2021  - Olivier DECOURBE - olivier.decourbe@protonmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+###
+
+import os
+import numpy as np
+import pandas as pd
+
+import backtest
+import strategies as strat
+import sweep
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Signal function of each strategy, called with the parameters of the grid that are not backtest parameters
+strategy_signals = {"golden_cross": strat.golden_cross_signal, "sar_strategy": strat.sar_signal}
+backtest_param_names = ["amount", "atr_length", "atr_multiplier"]
+
+
+def get_folds(open_times, train_size, test_size, step=None):
+    # Folds of train_size klines to optimize on followed by test_size klines to trade on, moved forward by step klines
+    # (test_size by default). Windows are given as [start, end) open times.
+    step = step if step else test_size
+    bounds = np.r_[open_times, open_times[-1] + 1] if len(open_times) else open_times
+    folds = []
+    for start in range(0, len(open_times) - train_size - test_size + 1, step):
+        train = (int(bounds[start]), int(bounds[start + train_size]))
+        test = (int(bounds[start + train_size]), int(bounds[start + train_size + test_size]))
+        folds.append((train, test))
+    return folds
+
+
+def run_windows(task):
+    # Signals and stops are computed once over the whole klines, then every window is backtested on a slice of them.
+    # The position still open at the end of a window is closed at its last close, each one starting without position.
+    symbol, strategy, params, windows = task
+    kline_frame = sweep.worker_klines[symbol]
+    signal = strategy_signals[strategy](kline_frame, **{name: value for name, value in params.items() if name not in backtest_param_names})
+    stop_offset = backtest.get_stop_offset(kline_frame, atr_length=params.get("atr_length", 14), atr_multiplier=params.get("atr_multiplier"))
+    close = kline_frame.close.values
+    open_times = kline_frame.index.values
+
+    results = []
+    for start_time, end_time in windows:
+        start, end = np.searchsorted(open_times, [start_time, end_time])
+        trades, equity = backtest.run_backtest(close[start:end], signal[start:end], amount=params.get("amount", 1000.0),
+                                               stop_offset=stop_offset[start:end] if stop_offset is not None else None,
+                                               close_at_end=True)
+        result = {"symbol": symbol, "strategy": strategy}
+        result.update(params)
+        result.update({"start_time": start_time, "end_time": end_time})
+        result.update(backtest.get_trade_summary(trades, equity))
+        results.append(result)
+    return results
+
+
+def evaluate_folds(results, folds, by="profit"):
+    # For each fold, parameters ranked first on the train window are traded on the test window. Folds without results
+    # for one of their windows are skipped.
+    param_names = [name for name in results.columns if name not in ["symbol", "start_time", "end_time"] + sweep.summary_names]
+    fold_rows = []
+    for fold, (train, test) in enumerate(folds):
+        train_results = results.loc[(results.start_time == train[0]) & (results.end_time == train[1])]
+        test_results = results.loc[(results.start_time == test[0]) & (results.end_time == test[1])]
+        if train_results.empty or test_results.empty:
+            logger.warning("No results for fold " + str(fold) + ", it is skipped")
+            continue
+        best = sweep.rank_results(train_results.drop(columns=["start_time", "end_time"]), by=by).iloc[[0]]
+
+        test_results = test_results.merge(best[param_names], on=param_names)
+        if test_results.empty:
+            logger.warning("No test results for the best parameters of fold " + str(fold) + ", it is skipped")
+            continue
+        tested = sweep.rank_results(test_results.drop(columns=["start_time", "end_time"]), by=by).iloc[0]
+
+        row = {"fold": fold, "train_start": train[0], "train_end": train[1], "test_start": test[0], "test_end": test[1]}
+        row.update(best[param_names].iloc[0].to_dict())
+        row["train_" + by] = best[by].iloc[0]
+        row.update({name: tested[name] for name in sweep.summary_names})
+        fold_rows.append(row)
+    return pd.DataFrame(fold_rows)
+
+
+def run_walk_forward(kline_frames, strategy, grid, train_size, test_size, step=None, by="profit", processes=None, interval=None):
+    # Walk-forward optimization of strategy over kline_frames (dict of symbol -> kline frame). Workers backtest one
+    # combination of parameters over every window of every fold, so that folds are run in parallel and share the
+    # indicators of the combination. Returns the out-of-sample results of each fold, and the results of every window.
+    open_times = np.unique(np.concatenate([frame.index.values for frame in kline_frames.values()]))
+    folds = get_folds(open_times, train_size, test_size, step=step)
+    if not folds:
+        raise ValueError("Not enough klines for a fold of " + str(train_size) + " + " + str(test_size) + " klines")
+
+    windows = list(dict.fromkeys(window for fold in folds for window in fold))
+    combinations = sweep.get_combinations(grid)
+    tasks = [(symbol, strategy, params, windows) for params in combinations for symbol in kline_frames]
+    logger.info("Walk-forward of " + str(len(combinations)) + " combinations of " + strategy + " over " + str(len(folds))
+                + " folds and " + str(len(kline_frames)) + " symbols with " + str(processes if processes else os.cpu_count())
+                + " processes")
+
+    task_results = sweep.map_shared(kline_frames, run_windows, tasks, processes=processes, interval=interval)
+    results = pd.DataFrame([result for window_results in task_results for result in window_results])
+    return evaluate_folds(results, folds, by=by), results
+
+
+def main():
+    import time
+    import Klines
+    import KlineSet
+
+    logging.basicConfig(filename="./outputs/logs/debug.log", level=logging.DEBUG, filemode="w",
+                        format="%(asctime)s [%(name)s] : %(message)s")
+
+    symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT"]
+    start_time = Klines.Klines.timestamp_to_binance("2021-01-01 00:00:00,00")
+    end_time = Klines.Klines.timestamp_to_binance("2023-01-01 00:00:00,00")
+    kline_set = KlineSet.KlineSet(symbols, "1h", start_time=start_time, end_time=end_time, futures=True, keep_last=True)
+    kline_frames = {symbol: kline_set.get_kline_frame(symbol) for symbol in symbols}
+
+    # Three months of optimization followed by one month of trading
+    grid = {"ma_type": ["sma", "wma"], "fast_ma": [5, 10, 20, 50], "slow_ma": [50, 100, 200],
+            "atr_length": [14], "atr_multiplier": [None, 1.2, 2.0, 3.0]}
+    start = time.time()
+    folds, results = run_walk_forward(kline_frames, "golden_cross", grid, train_size=24 * 90, test_size=24 * 30, interval="1h")
+    logger.debug("Walk-forward done in " + str(time.time() - start) + "s")
+    logger.debug("\n" + folds.to_string())
+    logger.debug("Out-of-sample profit : " + str(folds.profit.sum()) + ", in-sample profit : " + str(folds.train_profit.sum()))
+
+    grid = {"acceleration": [0.01, 0.02, 0.04], "maximum": [0.1, 0.2, 0.4], "atr_multiplier": [None, 1.2, 2.0]}
+    folds, results = run_walk_forward(kline_frames, "sar_strategy", grid, train_size=24 * 90, test_size=24 * 30, interval="1h")
+    logger.debug("\n" + folds.to_string())
+
+    kline_set.close()
+    print("End of the <<walkforward>> test phase.")
+
+
+if __name__ == '__main__':
+    main()